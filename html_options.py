@@ -0,0 +1,107 @@
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+# Parsed dropdowns kept per container, keyed by a hash of their html_content
+OPTION_CACHE_SIZE = int(os.getenv("OPTION_CACHE_SIZE", "2000"))
+
+# One pass over a <select>: optgroup openings and closings, and options up to their closing tag
+# or, when that is missing, up to the next option, optgroup or the end of the select
+SELECT_PATTERN = re.compile(
+    r"<optgroup\b(?P<group_attributes>[^>]*)>"
+    r"|(?P<group_end></optgroup\s*>)"
+    r"|<option\b(?P<attributes>[^>]*)>(?P<text>.*?)(?:</option\s*>|(?=<option\b|<optgroup\b|</optgroup|</select|\Z))",
+    re.IGNORECASE | re.DOTALL
+)
+ATTRIBUTE_PATTERN = re.compile(r"""([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+# Only real tags start with a letter, so option texts such as "<< me >>" survive tag stripping
+TAG_PATTERN = re.compile(r"</?[A-Za-z][^>]*>")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+_option_cache = OrderedDict()
+_option_lock = threading.Lock()
+
+
+def parse_attributes(text: str) -> Dict[str, str]:
+    return {match.group(1).lower(): html.unescape(next(value for value in match.groups()[1:] if value is not None))
+            for match in ATTRIBUTE_PATTERN.finditer(text)}
+
+
+def clean_text(text: str) -> str:
+    return WHITESPACE_PATTERN.sub(" ", html.unescape(TAG_PATTERN.sub("", text))).strip()
+
+
+def parse_options(select_html: str) -> List[Dict[str, str]]:
+    """
+    Parse the options of a <select> in a single pass.
+
+    Entities are decoded, options without a value take their text as value (as browsers do),
+    options with neither value nor text are skipped, and an option repeated with the same value
+    and text is listed once. Distinct texts sharing a value (Redmine's "is not" and "none" are
+    both "!") are all kept. An empty value is kept when the option has a text, since filters use
+    it for choices such as "any". Options inside an <optgroup> carry its label.
+
+    Returns:
+        Options with possible_value_id, possible_value_text and, when grouped, optgroup
+    """
+    options = []
+    seen = set()
+    group = None
+    for match in SELECT_PATTERN.finditer(select_html):
+        if match.group("group_attributes") is not None:
+            group = parse_attributes(match.group("group_attributes")).get("label")
+        elif match.group("group_end") is not None:
+            group = None
+        else:
+            attributes = parse_attributes(match.group("attributes"))
+            text = clean_text(match.group("text"))
+            value = attributes.get("value", text).strip()
+            if not (value or text) or (value, text) in seen:
+                continue
+            seen.add((value, text))
+            option = {"possible_value_id": value, "possible_value_text": text or attributes.get("label", value)}
+            if group:
+                option["optgroup"] = group
+            options.append(option)
+    return options
+
+
+def get_options(html_content: str) -> List[Dict[str, str]]:
+    """
+    Return the options of a recording input's html_content, a JSON encoded HTML string
+    (plain HTML is accepted as well).
+
+    Results are memoized by a hash of html_content, so a dropdown shared by many recordings or
+    requests is decoded and parsed once per container. The returned list is shared between
+    callers and must not be modified.
+    """
+    key = hashlib.sha1(html_content.encode()).hexdigest()
+    with _option_lock:
+        options = _option_cache.get(key)
+        if options is not None:
+            _option_cache.move_to_end(key)
+            return options
+
+    try:
+        select_html = json.loads(html_content)
+    except ValueError:
+        select_html = html_content
+    if not isinstance(select_html, str):
+        select_html = ""
+    options = parse_options(select_html) if "<select" in select_html.lower() else []
+    with _option_lock:
+        _option_cache[key] = options
+        while len(_option_cache) > OPTION_CACHE_SIZE:
+            _option_cache.popitem(last=False)
+    return options
+
+
+def option_table(options: List[Dict[str, str]]) -> List[List[str]]:
+    """Compact form of options for prompts: one [possible_value_id, possible_value_text, optgroup] row per option."""
+    return [[option["possible_value_id"], option["possible_value_text"]] + ([option["optgroup"]] if "optgroup" in option else [])
+            for option in options]
@@ -0,0 +1,74 @@
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Modules the Lambda handler must not import at cold start, they are loaded on first use only
+LAZY_MODULES = ("boto3", "botocore", "numpy")
+
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(module: str = "lambda_function", env: Optional[Dict[str, str]] = None) -> Dict[str, Tuple[int, int]]:
+    """
+    Import module in a fresh interpreter with -X importtime and return the cost of every module it pulled in.
+
+    Args:
+        module: The module to import
+        env: Environment of the interpreter (defaults to this process's)
+
+    Returns:
+        Mapping of module name to (self, cumulative) import time in microseconds
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {completed.stderr.strip().splitlines()[-1:]}")
+    times = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            times.setdefault(match.group(4), (int(match.group(1)), int(match.group(2))))
+    return times
+
+
+def report(times: Dict[str, Tuple[int, int]], top: int = 20) -> List[str]:
+    """Lines naming the top modules by cumulative import time, slowest first."""
+    slowest = sorted(times.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    return [f"{cumulative / 1000:9.1f} ms {self_time / 1000:9.1f} ms  {name}" for name, (self_time, cumulative) in slowest]
+
+
+def check_budget(times: Dict[str, Tuple[int, int]], module: str, budget_ms: float) -> List[str]:
+    """
+    Problems with a cold import of module: over budget_ms in total, or importing one of LAZY_MODULES.
+
+    Returns:
+        An empty list when the import is within budget
+    """
+    problems = []
+    total_ms = times.get(module, (0, 0))[1] / 1000
+    if total_ms > budget_ms:
+        problems.append(f"Importing {module} took {total_ms:.1f} ms, over the {budget_ms:.1f} ms budget")
+    for name in LAZY_MODULES:
+        if name in times:
+            problems.append(f"Importing {module} also imported {name} ({times[name][1] / 1000:.1f} ms)")
+    return problems
+
+
+def main():
+    # python import_timing.py [module] [budget in ms], exits with 1 when the budget is not met
+    module = sys.argv[1] if len(sys.argv) > 1 else "lambda_function"
+    times = import_times(module)
+    print("cumulative      self  module")
+    print("\n".join(report(times)))
+    if len(sys.argv) > 2:
+        problems = check_budget(times, module, float(sys.argv[2]))
+        print("\n".join(problems) or "Within budget")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
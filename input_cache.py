@@ -0,0 +1,119 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import ttl_cache
+
+# Prepared recordings kept in memory, and the directory they are spilled to (empty disables spilling)
+PREPARED_INPUT_CACHE_SIZE = int(os.getenv("PREPARED_INPUT_CACHE_SIZE", "2000"))
+PREPARED_INPUT_CACHE_MAX_BYTES = int(os.getenv("PREPARED_INPUT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PREPARED_INPUT_SPILL_DIR = os.getenv("PREPARED_INPUT_SPILL_DIR", "")
+
+UNSAFE_FILENAME_PATTERN = re.compile(r"[^\w.-]")
+
+
+class PreparedInputCache:
+    """
+    Prepared extraction inputs per recording, keyed by (Recording_Id, hash of Expected_User_Input).
+
+    A recording whose inputs change gets a new key, and the entries of its previous content
+    are dropped from memory and from the spill directory. Spilled entries survive in /tmp
+    for as long as the Lambda container does, even when the in-memory LRU evicts them.
+    """
+
+    def __init__(self, max_entries: int = PREPARED_INPUT_CACHE_SIZE, max_bytes: int = PREPARED_INPUT_CACHE_MAX_BYTES,
+                 spill_dir: str = PREPARED_INPUT_SPILL_DIR):
+        self.memory = ttl_cache.TTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl_seconds=0)
+        self.spill_dir = spill_dir
+        self._content_hashes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.spill_hits = 0
+
+    def get_or_prepare(self, recording: Dict, prepare: Callable[[Dict], Any]) -> Any:
+        """
+        Return the prepared inputs of recording, calling prepare(recording) only when they are not cached.
+
+        The prepared value is shared between callers and must not be modified. It has to be
+        JSON serializable when a spill directory is configured.
+        """
+        recording_id = recording.get("Recording_Id")
+        if recording_id is None:
+            return prepare(recording)
+        content = json.dumps(recording.get("Expected_User_Input", []), sort_keys=True, separators=(",", ":"))
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        key = (str(recording_id), content_hash)
+
+        self._invalidate_stale(key)
+        prepared = self.memory.get(key)
+        if prepared is None:
+            prepared = self._read_spill(key)
+            if prepared is None:
+                prepared = prepare(recording)
+                self._write_spill(key, prepared)
+            self.memory.put(key, prepared, len(content))
+        return prepared
+
+    def stats(self) -> Dict[str, int]:
+        stats = self.memory.stats()
+        stats["spill_hits"] = self.spill_hits
+        return stats
+
+    def _invalidate_stale(self, key) -> None:
+        recording_id, content_hash = key
+        with self._lock:
+            previous_hash = self._content_hashes.get(recording_id)
+            self._content_hashes[recording_id] = content_hash
+        if previous_hash is None and self.spill_dir:
+            # Spill files written before this container saw the recording may hold older content
+            current_path = self._spill_path(key)
+            for path in glob.glob(current_path.replace(content_hash, "*")):
+                if path != current_path:
+                    self._remove_file(path)
+        elif previous_hash is not None and previous_hash != content_hash:
+            self.memory.discard((recording_id, previous_hash))
+            self._remove_file(self._spill_path((recording_id, previous_hash)))
+
+    def _spill_path(self, key) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        recording_id, content_hash = key
+        return os.path.join(self.spill_dir, f"{UNSAFE_FILENAME_PATTERN.sub('_', recording_id)}-{content_hash}.json")
+
+    def _read_spill(self, key) -> Optional[Any]:
+        path = self._spill_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path) as spill_file:
+                prepared = json.load(spill_file)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self.spill_hits += 1
+        return prepared
+
+    def _write_spill(self, key, prepared: Any) -> None:
+        path = self._spill_path(key)
+        if path is None:
+            return
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            # Write to a private file first so concurrent readers never see a partial entry
+            temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "w") as spill_file:
+                json.dump(prepared, spill_file, separators=(",", ":"))
+            os.replace(temporary_path, path)
+        except OSError as e:
+            print(f"Could not spill prepared inputs to {path}: {e}")
+
+    @staticmethod
+    def _remove_file(path: Optional[str]) -> None:
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,71 @@
+import json
+import re
+from typing import Any, List
+
+# Trailing commas before a closing brace or bracket, which models sometimes copy from prompt templates
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+
+
+class IncrementalJSONArrayParser:
+    """
+    Parse the elements of a top-level JSON array while its text is still arriving.
+
+    Feed the text in pieces of any size; every object or array element is returned
+    by feed() as soon as its closing brace or bracket has been seen. Anything before
+    the opening "[" (such as a sentence of preamble) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.element_start = None
+        self.finished = False
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Add the next piece of text.
+
+        Returns:
+            The array elements completed by this piece, in order
+        """
+        self.buffer += text
+        elements = []
+        while self.position < len(self.buffer) and not self.finished:
+            char = self.buffer[self.position]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "[{":
+                if self.depth == 1:
+                    self.element_start = self.position
+                self.depth += 1
+            elif char in "]}":
+                self.depth -= 1
+                if self.depth == 1 and self.element_start is not None:
+                    elements.append(self._parse(self.buffer[self.element_start:self.position + 1]))
+                    self.element_start = None
+                elif self.depth == 0:
+                    self.finished = True
+            self.position += 1
+
+        if self.element_start is None and self.position > 0:
+            # Drop the consumed text so the buffer only ever holds the element in progress
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+        return elements
+
+    @staticmethod
+    def _parse(text: str) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return json.loads(TRAILING_COMMA_PATTERN.sub(r"\1", text))
@@ -1,11 +1,36 @@
 import json
-import boto3
 import sys
 import ast
 import test_anthropic3
+import recording_index
+import option_matcher
+import html_options
+import input_cache
+import single_flight
+import micro_batch
+import ttl_cache
+import json_stream
+import llm_resilience
+import llm_router
+import prompt_builder
+import request_metrics
 import os
+import re
+import hashlib
+import contextvars
+import asyncio
+import itertools
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-USE_DIRECT_ANTHROPIC = True
+# Default endpoint when LLM_ENDPOINTS is not set: the direct Anthropic API, or Bedrock in BEDROCK_REGION
+USE_DIRECT_ANTHROPIC = os.getenv("USE_DIRECT_ANTHROPIC", "true").lower() == "true"
+BEDROCK_REGION = os.getenv("BEDROCK_REGION", "us-west-2")
+# Comma-separated endpoints the router picks from: "anthropic", "anthropic@<api base url>" or "bedrock:<region>"
+LLM_ENDPOINTS = [endpoint.strip() for endpoint in os.getenv("LLM_ENDPOINTS", "anthropic" if USE_DIRECT_ANTHROPIC else f"bedrock:{BEDROCK_REGION}").split(",") if endpoint.strip()]
+# Send Bedrock calls to this URL instead of the regional endpoint, e.g. a local stub
+BEDROCK_ENDPOINT_URL = os.getenv("BEDROCK_ENDPOINT_URL")
 #modelId = "anthropic.claude-3-opus-20240229-v1:0"
 #modelIdNonTrivial = "anthropic.claude-3-5-sonnet-20240620-v1:0"
 modelIdTrivial = "anthropic.claude-3-5-haiku-20241022-v1:0"
@@ -13,59 +38,309 @@ modelIdNonTrivial = "anthropic.claude-3-5-haiku-20241022-v1:0"
 #modelIdTrivial = "anthropic.claude-3-5-sonnet-20240620-v1:0"
 #modelId = "anthropic.claude-3-haiku-20240307-v1:0"
 
+# Upper bound on concurrent extraction calls per request (overridable per request with "max_workers")
+EXTRACTION_MAX_WORKERS = int(os.getenv("EXTRACTION_MAX_WORKERS", "8"))
+# Number of recordings to rank and extract inputs for, 0 means all (overridable per request with "top_k")
+RANKING_TOP_K = int(os.getenv("RANKING_TOP_K", "0"))
+# Extract inputs for all ranked recordings in a single LLM call (overridable per request with "batched_extraction")
+BATCHED_EXTRACTION = os.getenv("BATCHED_EXTRACTION", "false").lower() == "true"
+# Number of recordings the local pre-ranker passes on to getRankedList, 0 sends the whole catalog (overridable per request with "shortlist_top_n")
+SHORTLIST_TOP_N = int(os.getenv("SHORTLIST_TOP_N", "0"))
+# Pre-ranker used for the shortlist: bm25, semantic or hybrid (overridable per request with "shortlist_scorer"), semantic and hybrid need NumPy, which the deploy bundle does not include
+SHORTLIST_SCORER = os.getenv("SHORTLIST_SCORER", "bm25")
+# Resolve person and project dropdowns by string similarity before asking the LLM (see option_matcher.resolve_option), off until evaluated against logged USTs (see README)
+FUZZY_OPTION_MATCH = os.getenv("FUZZY_OPTION_MATCH", "false").lower() == "true"
+# Send only the likeliest candidates of large dropdowns to the LLM (see option_matcher.prefilter_options)
+OPTION_PREFILTER = os.getenv("OPTION_PREFILTER", "true").lower() == "true"
+# Run lambda_handler through lambda_handler_async on the shared event loop
+ASYNC_PIPELINE = os.getenv("ASYNC_PIPELINE", "false").lower() == "true"
+# Rank catalogs whose label list is estimated above this many tokens in parallel chunks, then merge the chunk winners
+CHUNKED_RANKING_THRESHOLD_TOKENS = int(os.getenv("CHUNKED_RANKING_THRESHOLD_TOKENS", "20000"))
+# Estimated tokens of labels per ranking chunk, and recordings each chunk passes on when top_k is 0
+RANKING_CHUNK_TOKENS = int(os.getenv("RANKING_CHUNK_TOKENS", "8000"))
+RANKING_CHUNK_TOP_K = int(os.getenv("RANKING_CHUNK_TOP_K", "10"))
+RANKING_CHUNK_MAX_WORKERS = int(os.getenv("RANKING_CHUNK_MAX_WORKERS", "8"))
+# Let concurrent identical LLM calls share one request instead of each sending their own
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+# Send the instructions and the catalog or option lists as a cached system prefix (direct Anthropic API only)
+PROMPT_CACHING = os.getenv("PROMPT_CACHING", "true").lower() == "true"
+# Combine free-text extraction calls started within this many milliseconds of each other into one LLM call, 0 disables.
+# Under server.py this gathers calls from concurrent requests, in Lambda the recordings of one request.
+MICRO_BATCH_WINDOW_MS = float(os.getenv("MICRO_BATCH_WINDOW_MS", "0"))
+# Extraction calls at which a micro-batch is sent without waiting for the rest of the window
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "8"))
+# Stream the ranking and start extraction for each ranked recording as soon as it is parsed (overridable per request with "stream_ranking")
+STREAM_RANKING = os.getenv("STREAM_RANKING", "false").lower() == "true"
+# DEBUG also prints the UST and the stitched response of every request, INFO keeps payloads out of the logs
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
-# Bedrock Runtime client used to invoke and question the models
-bedrock_runtime = boto3.client(
-    service_name='bedrock-runtime',
-    region_name='us-west-2'
+# Module state below is shared by concurrent requests when running under server.py, every mutable object locks itself
+# Parsed LLM answers, kept at module level so they survive across warm invocations
+llm_cache = ttl_cache.TTLCache(
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
 )
+# Stitched results keyed by normalized UST and catalog fingerprint, to answer repeated questions without any LLM call
+response_cache = ttl_cache.TTLCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512")),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "900"))
+)
+# Recent per-endpoint call latencies, used to decide when to hedge a slow call
+latency_tracker = llm_resilience.LatencyTracker()
+# Picks the endpoint for every LLM call from its rolling latency, error rate and circuit breaker
+endpoint_router = llm_router.EndpointRouter(LLM_ENDPOINTS)
+# Identical LLM calls in flight, keyed like llm_cache, shared by worker threads and the event loop
+llm_single_flight = single_flight.SingleFlight()
+# Parsed option tables and input split per recording, reused while a recording's inputs stay the same
+prepared_input_cache = input_cache.PreparedInputCache()
+# Free-text extraction calls waiting to be sent together, see getInputValuesWithoutBBBatch
+extraction_batcher = micro_batch.MicroBatcher(lambda items: getInputValuesWithoutBBBatch(items), MICRO_BATCH_WINDOW_MS / 1000, MICRO_BATCH_MAX_SIZE)
+# Set per request (with "bypass_cache") to skip cache lookups for every LLM call made on its behalf
+llm_cache_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+# Bedrock Runtime clients per region, created on first use by getBedrockRuntime so that
+# containers calling the direct Anthropic API never import boto3
+bedrock_runtime_clients = {}
+bedrock_runtime_lock = threading.Lock()
+
+
+
+def getBedrockRuntime(region):
+    with bedrock_runtime_lock:
+        if region not in bedrock_runtime_clients:
+            import boto3
+            bedrock_runtime_clients[region] = boto3.client(
+                service_name='bedrock-runtime',
+                region_name=region,
+                endpoint_url=BEDROCK_ENDPOINT_URL
+            )
+        return bedrock_runtime_clients[region]
+
+def getAnthropicClient(endpoint, model_id):
+    # "anthropic@http://localhost:8080/v1" talks to that base URL, plain "anthropic" to ANTHROPIC_BASE_URL
+    base_url = endpoint.partition("@")[2] or None
+    return test_anthropic3.get_client(os.getenv("ANTHROPIC_API_KEY"), model_id, base_url)
+
+def getLLMCacheKey(prompt, model_id, temperature, system=None):
+    # Every endpoint serves the same model, so answers are shared whichever endpoint produced them
+    digest = hashlib.sha256(getSystemText(system).encode() + b"\0" + prompt.encode()).hexdigest()
+    return (model_id, temperature, digest)
+
+def getSystemPrompt(text, cacheable=True):
+    # Only a system prompt that repeats across requests is marked for prompt caching, one depending on the UST
+    # (a shortlisted catalog, pre-filtered options) would pay the cache write premium without ever being read back
+    return [test_anthropic3.cacheable_text(text)] if PROMPT_CACHING and cacheable else text
+
+def getPromptParts(system, prompt, cacheable=True):
+    # Template indentation only costs tokens, the model reads the prompt the same without it
+    return getSystemPrompt(prompt_builder.strip_template(system), cacheable), prompt_builder.strip_template(prompt)
+
+def getSystemText(system):
+    if system is None or isinstance(system, str):
+        return system or ""
+    return "".join(block["text"] for block in system)
+
+def invokeBedrock(prompt, model_id, temperature, region=BEDROCK_REGION, system=None):
+    request = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 4096,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature,
+        "top_p": 1
+    }
+    if system:
+        request["system"] = getSystemText(system)
+    body = json.dumps(request)
+    
+    response = getBedrockRuntime(region).invoke_model(
+        body=body,
+        modelId=model_id,
+        accept='application/json',
+        contentType='application/json'
+    )
+    
+    # Same shape as a Messages API response, with content and usage
+    return json.loads(response.get('body').read())
+
+def recordEndpointError(endpoint, error):
+    # Only errors worth retrying say the endpoint is unhealthy, a 400 for an over-long prompt must not open its breaker
+    if llm_resilience.is_retryable(error):
+        endpoint_router.record_failure(endpoint)
+    else:
+        # The endpoint did answer, which also settles a half-open breaker's trial call
+        endpoint_router.record_success(endpoint, None)
+
+def invokeEndpoint(endpoint, prompt, model_id, temperature, system=None):
+    # One attempt on one endpoint, reported to the router, the latency tracker and the request metrics
+    started = time.perf_counter()
+    try:
+        if endpoint.startswith("anthropic"):
+            response = getAnthropicClient(endpoint, model_id).create_message(content=prompt, system=system)
+        else:
+            response = invokeBedrock(prompt, model_id, temperature, region=endpoint.partition(":")[2] or BEDROCK_REGION, system=system)
+        answer = response["content"][0]["text"]
+    except Exception as e:
+        recordEndpointError(endpoint, e)
+        request_metrics.record_call(endpoint, model_id, time.perf_counter() - started, error=e)
+        raise
+    elapsed = time.perf_counter() - started
+    request_metrics.record_call(endpoint, model_id, elapsed, response.get("usage"))
+    endpoint_router.record_success(endpoint, elapsed)
+    latency_tracker.record(endpoint, elapsed)
+    return answer
+
+async def invokeEndpointAsync(endpoint, prompt, model_id, temperature, system=None):
+    started = time.perf_counter()
+    try:
+        if endpoint.startswith("anthropic"):
+            base_url = endpoint.partition("@")[2] or None
+            client = test_anthropic3.get_async_client(os.getenv("ANTHROPIC_API_KEY"), model_id, base_url)
+            response = await client.create_message(content=prompt, system=system)
+        else:
+            region = endpoint.partition(":")[2] or BEDROCK_REGION
+            response = await asyncio.get_running_loop().run_in_executor(None, invokeBedrock, prompt, model_id, temperature, region, system)
+        answer = response["content"][0]["text"]
+    except Exception as e:
+        recordEndpointError(endpoint, e)
+        request_metrics.record_call(endpoint, model_id, time.perf_counter() - started, error=e)
+        raise
+    elapsed = time.perf_counter() - started
+    request_metrics.record_call(endpoint, model_id, elapsed, response.get("usage"))
+    endpoint_router.record_success(endpoint, elapsed)
+    latency_tracker.record(endpoint, elapsed)
+    return answer
+
+def invokeRouted(endpoint, prompt, model_id, temperature, system=None, exclude=()):
+    # One logical call: retried on 429/5xx, each retry routed afresh so it can move off a failing endpoint
+    attempts = iter([endpoint])
+    def attempt():
+        return invokeEndpoint(next(attempts, None) or endpoint_router.choose(exclude), prompt, model_id, temperature, system)
+    return llm_resilience.call_with_retry(attempt)
 
+async def invokeRoutedAsync(endpoint, prompt, model_id, temperature, system=None, exclude=()):
+    attempts = iter([endpoint])
+    async def attempt():
+        return await invokeEndpointAsync(next(attempts, None) or endpoint_router.choose(exclude), prompt, model_id, temperature, system)
+    return await llm_resilience.call_with_retry_async(attempt)
 
+def getHedgeExclude(endpoint):
+    return (endpoint,) if llm_resilience.HEDGE_BACKEND == "alternate" else ()
 
-def call_llm(prompt, model_id, temperature=0.2):
+def invokeLLM(prompt, model_id, temperature, system=None):
     """
-    Makes a call to the LLM using either direct Anthropic API or Bedrock
+    Sends the prompt to the endpoint picked by endpoint_router and returns the answer text
+    
+    Once enough calls have been seen, a call still running after the hedging percentile of recent
+    latencies is duplicated (see llm_resilience) and the first answer wins.
+    """
+    endpoint = endpoint_router.choose()
+    delay = latency_tracker.hedge_delay(endpoint)
+    if delay is None:
+        return invokeRouted(endpoint, prompt, model_id, temperature, system)
+    return llm_resilience.call_hedged(
+        lambda: invokeRouted(endpoint, prompt, model_id, temperature, system),
+        lambda: invokeRouted(endpoint_router.choose(getHedgeExclude(endpoint)), prompt, model_id, temperature, system, getHedgeExclude(endpoint)),
+        delay
+    )
+
+async def invokeLLMAsync(prompt, model_id, temperature, system=None):
+    endpoint = endpoint_router.choose()
+    delay = latency_tracker.hedge_delay(endpoint)
+    if delay is None:
+        return await invokeRoutedAsync(endpoint, prompt, model_id, temperature, system)
+    return await llm_resilience.call_hedged_async(
+        lambda: invokeRoutedAsync(endpoint, prompt, model_id, temperature, system),
+        lambda: invokeRoutedAsync(endpoint_router.choose(getHedgeExclude(endpoint)), prompt, model_id, temperature, system, getHedgeExclude(endpoint)),
+        delay
+    )
+
+def call_llm(prompt, model_id, temperature=0.2, use_cache=True, system=None):
+    """
+    Makes a call to the LLM through the direct Anthropic API or Bedrock, whichever endpoint_router picks
+    
+    A call identical to one already in flight waits for that call's answer instead of sending its own.
     
     Args:
         prompt (str): The prompt to send to the LLM
         model_id (str): The model ID to use
         temperature (float): Temperature parameter for the model (default: 0.2)
+        use_cache (bool): Serve identical prompts from llm_cache (default: True)
+        system (str or list): System prompt, see getSystemPrompt (default: None)
     
     Returns:
         dict: Parsed JSON response from the LLM
     """
-    if USE_DIRECT_ANTHROPIC:
-        client = test_anthropic3.SimpleAnthropicClient(os.getenv("ANTHROPIC_API_KEY"), model_id)
-        response = client.create_message(content=prompt)
-        answer = response["content"][0]["text"]
-        return json.loads(answer)
+    cache_key = getLLMCacheKey(prompt, model_id, temperature, system)
+    prompt_builder.log_prompt_size(model_id, getSystemText(system), prompt)
+    use_cache = use_cache and not llm_cache_bypass.get()
+    if use_cache:
+        answer = llm_cache.get(cache_key)
+        if answer is not None:
+            return json.loads(answer)
+
+    if SINGLE_FLIGHT:
+        answer = llm_single_flight.do(cache_key, lambda: invokeLLM(prompt, model_id, temperature, system))
     else:
-        body = json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 4096,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": temperature,
-            "top_p": 1
-        })
-        
-        response = bedrock_runtime.invoke_model(
-            body=body,
-            modelId=model_id,
-            accept='application/json',
-            contentType='application/json'
-        )
-        
-        response_body = json.loads(response.get('body').read())
-        answer = response_body.get("content")[0].get("text")
-        return json.loads(answer)
+        answer = invokeLLM(prompt, model_id, temperature, system)
 
-def getRankedList(ust,list_of_recordings):
-    prompt = f"""
-        Given the following User Search Term (UST):
-        "{ust}"
+    parsed_answer = json.loads(answer)
+    if use_cache:
+        llm_cache.put(cache_key, answer, len(answer.encode()))
+    return parsed_answer
+
+async def call_llm_async(prompt, model_id, temperature=0.2, use_cache=True, system=None):
+    """
+    Async variant of call_llm, sharing its cache
+
+    The direct Anthropic API goes through the asyncio client on the shared event loop,
+    Bedrock calls run on the loop's default executor.
+    """
+    cache_key = getLLMCacheKey(prompt, model_id, temperature, system)
+    prompt_builder.log_prompt_size(model_id, getSystemText(system), prompt)
+    use_cache = use_cache and not llm_cache_bypass.get()
+    if use_cache:
+        answer = llm_cache.get(cache_key)
+        if answer is not None:
+            return json.loads(answer)
+
+    if SINGLE_FLIGHT:
+        answer = await llm_single_flight.do_async(cache_key, lambda: invokeLLMAsync(prompt, model_id, temperature, system))
+    else:
+        answer = await invokeLLMAsync(prompt, model_id, temperature, system)
+
+    parsed_answer = json.loads(answer)
+    if use_cache:
+        llm_cache.put(cache_key, answer, len(answer.encode()))
+    return parsed_answer
+
+def submitInContext(executor, fn, *args):
+    # Each task runs in a copy of the caller's context so per-request settings such as llm_cache_bypass follow it
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+def getRankedListPrompt(ust, list_of_recordings, top_k=0, cacheable=False):
+    """
+    Builds the ranking prompt as a system prompt holding the instructions and the catalog,
+    and a user prompt holding the UST
+    
+    The catalog is serialized as compact JSON, with duplicate and overlong labels trimmed
+    when it is over PROMPT_TOKEN_BUDGET. The system prompt is only cached when cacheable,
+    i.e. list_of_recordings is the whole catalog (or a chunk of it), which repeats across requests.
+    
+    Returns:
+        tuple: The system prompt and the user prompt
+    """
+    if top_k > 0:
+        coverage_instruction = f"Include only the {top_k} best recording ids in the ranked list, one entry per recording id."
+    else:
+        coverage_instruction = "Include all labels in the ranked list."
+    def render(labels_with_ids):
+        return f"""
+        You rank recording labels by how well they answer a User Search Term (UST).
         
-        And the following list of recording labels with their Serial IDs and Redocrding IDs:
-        {list_of_recordings}
+        This is the list of recording labels with their Serial IDs and Redocrding IDs:
+        {prompt_builder.compact_json(labels_with_ids)}
         
         Please rank all the labels from best to worst in terms of answering the UST. Consider the semantic meaning and relevance of each label to the UST.
         Provide your answer in the following format:
@@ -83,39 +358,274 @@ def getRankedList(ust,list_of_recordings):
             ...
         ]
         Select only one label per recording id. Ie if there are 3 labels for a recording id, select only the best one.
-        Include all labels in the ranked list. Only provide the JSON array as your response, without any additional text.
+        Only provide the JSON array as your response, without any additional text.
         """
-    return call_llm(prompt, modelIdNonTrivial)
+    system, _ = prompt_builder.fit_to_budget(render, list_of_recordings, prompt_builder.LABEL_TRIM_STEPS)
+    prompt = f"""
+        User Search Term (UST):
+        "{ust}"
+        
+        {coverage_instruction}
+        """
+    return getPromptParts(system, prompt, cacheable)
+
+def getRankingChunks(list_of_recordings):
+    """
+    Splits the label list into chunks of about RANKING_CHUNK_TOKENS when it is too big for one ranking prompt
+    
+    All labels of a recording stay in the same chunk, so every chunk can pick one label per recording.
+    
+    Returns:
+        list: Label lists, one per chunk, or None when the labels fit in a single prompt
+    """
+    if CHUNKED_RANKING_THRESHOLD_TOKENS <= 0 or prompt_builder.estimate_tokens(prompt_builder.compact_json(list_of_recordings)) <= CHUNKED_RANKING_THRESHOLD_TOKENS:
+        return None
+    labels_by_recording = {}
+    for entry in list_of_recordings:
+        labels_by_recording.setdefault(str(entry["recording_id"]), []).append(entry)
+    if len(labels_by_recording) < 2:
+        return None
+
+    chunks = [[]]
+    chunk_tokens = 0
+    for labels in labels_by_recording.values():
+        tokens = prompt_builder.estimate_tokens(prompt_builder.compact_json(labels))
+        if chunks[-1] and chunk_tokens + tokens > RANKING_CHUNK_TOKENS:
+            chunks.append([])
+            chunk_tokens = 0
+        chunks[-1].extend(labels)
+        chunk_tokens += tokens
+    return chunks if len(chunks) > 1 else None
+
+def getChunkWinners(list_of_recordings, ranked_chunks):
+    # The merge round sees every label of the recordings that won a chunk, not just the winning label
+    winners = {str(entry.get("selected_recording_id")) for ranked_chunk in ranked_chunks if isinstance(ranked_chunk, list)
+               for entry in ranked_chunk if isinstance(entry, dict)}
+    return [entry for entry in list_of_recordings if str(entry["recording_id"]) in winners]
+
+def mapRankingChunks(ust, list_of_recordings, top_k=0, cacheable=False):
+    """
+    Map step of chunked ranking: ranks the chunks of a catalog too big for one prompt in parallel
+    
+    Each chunk passes on its top_k best recordings (RANKING_CHUNK_TOP_K when top_k is 0), and chunking
+    repeats until the winners fit one prompt. Recordings that lose in their chunk are left out.
+    
+    Args:
+        ust (str): The User Search Term
+        list_of_recordings (list): The labels, each with serial_id, recording_id and label
+        top_k (int): Number of recordings the final ranking returns, 0 ranks all
+        cacheable (bool): Whether list_of_recordings is the whole catalog, only then are the first round's chunks cached
+    
+    Returns:
+        list: The labels for the final ranking round, list_of_recordings itself when it needs no chunking
+    """
+    chunk_top_k = top_k if top_k > 0 else RANKING_CHUNK_TOP_K
+    chunks = getRankingChunks(list_of_recordings)
+    while chunks:
+        print(f"Chunked ranking: {len(list_of_recordings)} labels in {len(chunks)} chunks")
+        with ThreadPoolExecutor(max_workers=RANKING_CHUNK_MAX_WORKERS) as executor:
+            futures = [submitInContext(executor, rankLabels, ust, chunk, chunk_top_k, cacheable) for chunk in chunks]
+            winners = getChunkWinners(list_of_recordings, [future.result() for future in futures])
+        if not winners or len(winners) >= len(list_of_recordings):
+            break
+        # The winners depend on the UST, so later rounds are not cached
+        list_of_recordings = winners
+        cacheable = False
+        chunks = getRankingChunks(list_of_recordings)
+    return list_of_recordings
 
-def getInputValuesWithBB(inputs, ust):
+async def mapRankingChunksAsync(ust, list_of_recordings, top_k=0, cacheable=False):
+    chunk_top_k = top_k if top_k > 0 else RANKING_CHUNK_TOP_K
+    chunks = getRankingChunks(list_of_recordings)
+    semaphore = asyncio.Semaphore(RANKING_CHUNK_MAX_WORKERS)
+    async def rankChunk(chunk, cacheable):
+        async with semaphore:
+            return await rankLabelsAsync(ust, chunk, chunk_top_k, cacheable)
+    while chunks:
+        print(f"Chunked ranking: {len(list_of_recordings)} labels in {len(chunks)} chunks")
+        winners = getChunkWinners(list_of_recordings, await asyncio.gather(*(rankChunk(chunk, cacheable) for chunk in chunks)))
+        if not winners or len(winners) >= len(list_of_recordings):
+            break
+        list_of_recordings = winners
+        cacheable = False
+        chunks = getRankingChunks(list_of_recordings)
+    return list_of_recordings
+
+def rankLabels(ust, list_of_recordings, top_k=0, cacheable=False):
+    # A single ranking round over labels that fit one prompt
+    system, prompt = getRankedListPrompt(ust, list_of_recordings, top_k, cacheable)
+    return call_llm(prompt, modelIdNonTrivial, system=system)
+
+async def rankLabelsAsync(ust, list_of_recordings, top_k=0, cacheable=False):
+    system, prompt = getRankedListPrompt(ust, list_of_recordings, top_k, cacheable)
+    return await call_llm_async(prompt, modelIdNonTrivial, system=system)
+
+def getRankedList(ust,list_of_recordings, top_k=0, cacheable=False):
+    # The merge round of a chunked ranking sees UST-specific winners, so only an unchunked catalog stays cacheable
+    ranked_labels = mapRankingChunks(ust, list_of_recordings, top_k, cacheable)
+    return rankLabels(ust, ranked_labels, top_k, cacheable and ranked_labels is list_of_recordings)
+
+def streamRankedList(ust, list_of_recordings, top_k=0, cacheable=False):
+    """
+    Yields the ranked list entries one by one while the model is still writing the rest
+    
+    Only direct Anthropic API endpoints are streamed, Bedrock answers and cache hits are yielded
+    from the complete list. A stream read to the end is stored in llm_cache like getRankedList does,
+    one the caller stops reading early (a top_k cutoff) is not cached.
+    Catalogs too big for one prompt are first narrowed by mapRankingChunks, only the merge round is streamed.
+    
+    Args:
+        ust (str): The User Search Term
+        list_of_recordings (list): The labels sent to the ranker, each with serial_id, recording_id and label
+        top_k (int): Number of recordings to rank, 0 ranks all
+        cacheable (bool): Whether list_of_recordings is the whole catalog, see getRankedListPrompt
+    
+    Yields:
+        dict: Ranked entries with rank, selected_index, selected_recording_id and selected_label
+    """
+    ranked_labels = mapRankingChunks(ust, list_of_recordings, top_k, cacheable)
+    system, prompt = getRankedListPrompt(ust, ranked_labels, top_k, cacheable and ranked_labels is list_of_recordings)
+    bedrock_endpoints = [endpoint for endpoint in LLM_ENDPOINTS if not endpoint.startswith("anthropic")]
+    if len(bedrock_endpoints) == len(LLM_ENDPOINTS):
+        yield from call_llm(prompt, modelIdNonTrivial, system=system)
+        return
+
+    cache_key = getLLMCacheKey(prompt, modelIdNonTrivial, 0.2, system)
+    prompt_builder.log_prompt_size(modelIdNonTrivial, getSystemText(system), prompt)
+    use_cache = not llm_cache_bypass.get()
+    answer = llm_cache.get(cache_key) if use_cache else None
+    if answer is not None:
+        yield from json.loads(answer)
+        return
+
+    endpoint = endpoint_router.choose(exclude=bedrock_endpoints)
+    parser = json_stream.IncrementalJSONArrayParser()
+    text_parts = []
+    usage = {}
+    completed = False
+    error = None
+    started = time.perf_counter()
+    events = getAnthropicClient(endpoint, modelIdNonTrivial).create_message(content=prompt, system=system, stream=True)
+    try:
+        for event in events:
+            if event["type"] == "text":
+                text_parts.append(event["text"])
+                yield from parser.feed(event["text"])
+            elif event["type"] == "usage":
+                usage = event["usage"]
+        completed = True
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        # Also runs when the caller closes this generator early, so the router always hears back and
+        # a half-open endpoint's trial call is never left in flight
+        events.close()
+        elapsed = time.perf_counter() - started
+        if error is not None:
+            recordEndpointError(endpoint, error)
+        else:
+            endpoint_router.record_success(endpoint, elapsed if completed else None)
+        # The stream is consumed while extraction runs, so its calls are attributed to ranking explicitly
+        request_metrics.record_call(endpoint, modelIdNonTrivial, elapsed, usage, error=error, stage_name="ranking")
+
+    answer = "".join(text_parts)
+    if use_cache:
+        try:
+            json.loads(answer)
+            llm_cache.put(cache_key, answer, len(answer.encode()))
+        except json.JSONDecodeError:
+            pass
+
+async def getRankedListAsync(ust, list_of_recordings, top_k=0, cacheable=False):
+    ranked_labels = await mapRankingChunksAsync(ust, list_of_recordings, top_k, cacheable)
+    return await rankLabelsAsync(ust, ranked_labels, top_k, cacheable and ranked_labels is list_of_recordings)
+
+def formatInputsWithBB(inputs):
     formatted_inputs = []
     for input_dict in inputs:
         for input_name, input_data in input_dict.items():
-            html_content = json.loads(input_data["html_content"])
-            input_metadata = input_data["input_metadata"]
-            options = []
-            if '<select' in html_content:
-                # Extract all option values and texts using basic string operations
-                option_parts = html_content.split('<option')
-                for part in option_parts[1:]:  # Skip first split as it's before first option
-                    if 'value="' in part:
-                        id = part.split('value="')[1].split('"')[0]
-                        # Get text between > and </option>
-                        value_text = part.split('>')[1].split('</option')[0] if '</option' in part else value
-                        options.append({"possible_value_id": id, "possible_value_text": value_text})
-            
             formatted_inputs.append({
                 "input_name": input_name,
-                "possible_values": options,
-                "input_metadata": input_metadata
+                "possible_values": html_options.get_options(input_data["html_content"]),
+                "input_metadata": input_data["input_metadata"]
             })
+    return formatted_inputs
 
-    prompt = f"""
-    Given the following user query:
-    "{ust}"
+def getPromptInputs(formatted_inputs):
+    # Options go into prompts as compact [possible_value_id, possible_value_text, optgroup] rows
+    return [dict(formatted_input, possible_values=html_options.option_table(formatted_input["possible_values"]))
+            for formatted_input in formatted_inputs]
+
+def resolveInputsLocally(formatted_inputs, ust, labels=()):
+    """
+    Resolves the person and project dropdowns whose option is clear from string similarity alone
+    
+    Args:
+        formatted_inputs (list): Inputs as returned by formatInputsWithBB
+        ust (str): The User Search Term
+        labels (list): Labels of the recording, their words are ignored when matching options
+    
+    Returns:
+        tuple: Input values keyed by input_name for the resolved inputs, and the inputs left for the LLM
+    """
+    resolved_values = {}
+    unresolved_inputs = []
+    label_tokens = set(recording_index.tokenize(" ".join(labels)))
+    for formatted_input in formatted_inputs:
+        value_id = None
+        if FUZZY_OPTION_MATCH and option_matcher.is_name_dropdown(formatted_input["input_metadata"], formatted_input["possible_values"]):
+            value_id = option_matcher.resolve_option(ust, formatted_input["possible_values"], label_tokens)
+        if value_id is None:
+            unresolved_inputs.append(formatted_input)
+        else:
+            resolved_values[formatted_input["input_name"]] = {
+                "Input": formatted_input["input_name"],
+                "found": "True",
+                "InputValue": value_id
+            }
+    return resolved_values, unresolved_inputs
+
+def prefilterInputs(formatted_inputs, ust):
+    """
+    Replaces the options of large dropdowns by their likeliest candidates for the UST
+    
+    Args:
+        formatted_inputs (list): Inputs as returned by formatInputsWithBB, left unmodified
+        ust (str): The User Search Term
+    
+    Returns:
+        list: The inputs to send to the LLM, with possibly fewer possible_values each
+    """
+    if not OPTION_PREFILTER:
+        return formatted_inputs
+    filtered_inputs = []
+    for formatted_input in formatted_inputs:
+        kept, dropped = option_matcher.prefilter_options(ust, formatted_input["possible_values"])
+        if dropped:
+            # Dropped options are often people's names, so they are only printed at LOG_LEVEL=DEBUG
+            print(f"Option pre-filter for {formatted_input['input_name']}: kept {len(kept)}, dropped {len(dropped)}")
+            logDebug("Options dropped:", [option["possible_value_text"] for option in dropped])
+            formatted_input = dict(formatted_input, possible_values=kept)
+        filtered_inputs.append(formatted_input)
+    return filtered_inputs
+
+def mergeInputValues(formatted_inputs, resolved_values, llm_values):
+    # Without local matches the LLM answer is returned as is
+    if not resolved_values:
+        return llm_values
+    values_by_input = {value["Input"]: value for value in llm_values if "Input" in value}
+    values_by_input.update(resolved_values)
+    return [values_by_input.get(formatted_input["input_name"], {"Input": formatted_input["input_name"], "found": "False", "InputValue": ""})
+            for formatted_input in formatted_inputs]
+
+def getInputValuesWithBBPrompt(formatted_inputs, ust, cacheable=True):
+    def render(inputs):
+        return f"""
+    You match a user query to the possible values of the following input_name's:
+    {prompt_builder.compact_json(getPromptInputs(inputs))}
     
-    And the following input_name's with their possible values:
-    {json.dumps(formatted_inputs, indent=2)}
+    Each of the possible_values is a [possible_value_id, possible_value_text] row, followed by its option group when it has one.
     
     Please search for the most appropriate possible_value_text for each input_name based on the user query. Use the input_metadata to help you understand the context of the input_name.
     And return the corresponding possible_value_id for each input_name.
@@ -134,14 +644,37 @@ def getInputValuesWithBB(inputs, ust):
     
     Only provide the JSON array as your response, without any additional explanation.
     """
-    return call_llm(prompt, modelIdNonTrivial)
-
-def getInputValuesWithoutBB(inputs, ust):
+    system, _ = prompt_builder.fit_to_budget(render, formatted_inputs, prompt_builder.INPUT_TRIM_STEPS)
     prompt = f"""
-    Given the following user query:
+    User query:
     "{ust}"
-    
-    Please extract the following variables:
+    """
+    return getPromptParts(system, prompt, cacheable)
+
+@request_metrics.timed("extract_with_bb")
+def getInputValuesWithBB(all_formatted_inputs, ust, labels=()):
+    resolved_values, formatted_inputs = resolveInputsLocally(all_formatted_inputs, ust, labels)
+    formatted_inputs = prefilterInputs(formatted_inputs, ust)
+    llm_values = []
+    if formatted_inputs or not resolved_values:
+        # Inputs resolved locally or options pre-filtered for this UST make the option lists request-specific
+        system, prompt = getInputValuesWithBBPrompt(formatted_inputs, ust, cacheable=formatted_inputs == all_formatted_inputs)
+        llm_values = call_llm(prompt, modelIdNonTrivial, system=system)
+    return mergeInputValues(all_formatted_inputs, resolved_values, llm_values)
+
+@request_metrics.timed("extract_with_bb")
+async def getInputValuesWithBBAsync(all_formatted_inputs, ust, labels=()):
+    resolved_values, formatted_inputs = resolveInputsLocally(all_formatted_inputs, ust, labels)
+    formatted_inputs = prefilterInputs(formatted_inputs, ust)
+    llm_values = []
+    if formatted_inputs or not resolved_values:
+        system, prompt = getInputValuesWithBBPrompt(formatted_inputs, ust, cacheable=formatted_inputs == all_formatted_inputs)
+        llm_values = await call_llm_async(prompt, modelIdNonTrivial, system=system)
+    return mergeInputValues(all_formatted_inputs, resolved_values, llm_values)
+
+def getInputValuesWithoutBBPrompt(inputs, ust):
+    system = f"""
+    You extract the following variables from a user query:
     {', '.join(inputs)}
     
     For each variable, provide the extracted value if found in the query. If the information is not present, set "found" to "False" and "InputValue" to an empty string.
@@ -158,13 +691,90 @@ def getInputValuesWithoutBB(inputs, ust):
     
     Only provide the JSON array as your response, without any additional explanation.
     """
-    return call_llm(prompt, modelIdTrivial, temperature=0.5)
+    prompt = f"""
+    User query:
+    "{ust}"
+    """
+    return getPromptParts(system, prompt)
+
+def getInputValuesWithoutBBBatchPrompt(queries):
+    system = """
+    You extract variables from several user queries at once. Each query has an id, its text and the names of the variables to extract from it.
+    
+    For each query and each of its variables, provide the value extracted from that query's text only. If the information is not present, set "found" to "False" and "InputValue" to an empty string.
+    
+    Format your response as a JSON object mapping every query id to a JSON array of objects, like this:
+    {
+        "0": [
+            {
+                "Input": "input_name",
+                "found": "True",
+                "InputValue": "extracted_value"
+            },
+            ...
+        ],
+        ...
+    }
+    
+    Only provide the JSON object as your response, without any additional explanation.
+    """
+    prompt = f"""
+    Queries:
+    {prompt_builder.compact_json([{"id": str(position), "query": ust, "variables": list(inputs)} for position, (inputs, ust) in enumerate(queries)])}
+    """
+    return getPromptParts(system, prompt)
+
+def getInputValuesWithoutBBBatch(items):
+    """
+    Answers several free-text extraction calls with a single LLM call, used by extraction_batcher
+    
+    Identical calls are asked once. Variables the answer leaves out are reported as not found.
+    
+    Args:
+        items (list): (inputs, ust) pairs
+    
+    Returns:
+        list: The extracted values of each item, in the same order as items
+    """
+    queries = list(dict.fromkeys(items))
+    if len(queries) == 1:
+        system, prompt = getInputValuesWithoutBBPrompt(*queries[0])
+        answers = [call_llm(prompt, modelIdTrivial, temperature=0.5, system=system)]
+    else:
+        system, prompt = getInputValuesWithoutBBBatchPrompt(queries)
+        answer = call_llm(prompt, modelIdTrivial, temperature=0.5, system=system)
+        answers = [answer.get(str(position)) if isinstance(answer, dict) else None for position in range(len(queries))]
+
+    values_by_query = {}
+    for (inputs, ust), answer in zip(queries, answers):
+        found = {value.get("Input"): value for value in answer if isinstance(value, dict)} if isinstance(answer, list) else {}
+        values_by_query[(inputs, ust)] = [found.get(name, {"Input": name, "found": "False", "InputValue": ""}) for name in inputs]
+    return [values_by_query[item] for item in items]
+
+@request_metrics.timed("extract_without_bb")
+def getInputValuesWithoutBB(inputs, ust):
+    if MICRO_BATCH_WINDOW_MS > 0:
+        # The batch is sent from the first caller's thread, so per-request settings such as llm_cache_bypass follow that caller
+        return extraction_batcher.submit((tuple(inputs), ust))
+    system, prompt = getInputValuesWithoutBBPrompt(inputs, ust)
+    return call_llm(prompt, modelIdTrivial, temperature=0.5, system=system)
+
+@request_metrics.timed("extract_without_bb")
+async def getInputValuesWithoutBBAsync(inputs, ust):
+    if MICRO_BATCH_WINDOW_MS > 0:
+        # Waiting for the batch blocks, so it happens on the loop's default executor
+        return await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, extraction_batcher.submit, (tuple(inputs), ust))
+    system, prompt = getInputValuesWithoutBBPrompt(inputs, ust)
+    return await call_llm_async(prompt, modelIdTrivial, temperature=0.5, system=system)
 
-def getStitchedResponse(ust, matched_recordings):
+def getStitchedResponse(ust, matched_recordings, omitted_candidates=0, debug=None):
     formatted_json = {
         "UST": ust,
-        "matched_recordings": []
+        "matched_recordings": [],
+        "omitted_candidates": omitted_candidates
     }
+    if debug is not None:
+        formatted_json["debug"] = debug
 
     for recording in matched_recordings:
         input_values = recording["inputValues"]
@@ -199,101 +809,347 @@ def rerankMatchedRecordingsBasedOnInputsFound(matched_recordings):
                                  if input_value['found'] == 'True'),
                  reverse=True)
 
-def lambda_handler(event, context):
-    try:
-        # Check if the body is in the event
-        if 'body' in event:
-            print ("Body found in event")
-            # If the body is a string, parse it as JSON
-            if isinstance(event['body'], str):
-                post_data = json.loads(event['body'])
-            else:
-                post_data = event['body']
-        else:
-            if isinstance(event, str):
-                post_data = json.loads(event)
-            else:
-                post_data = event
+def getRecordingInputs(a_recording):
+    inputs_without_bb = [input_data["Input"] for input_data in a_recording["Expected_User_Input"] if "html_content" not in input_data]
+    #inputs_with_bb = [{input_data["Input"]: input_data["html_content"]} for input_data in a_recording["Expected_User_Input"] if "html_content"  in input_data]
+    inputs_with_bb = [{
+        input_data["Input"]: {
+            "html_content": input_data["html_content"],
+            "input_metadata": input_data.get("input_metadata", "")
+        }
+    } for input_data in a_recording["Expected_User_Input"] if "html_content" in input_data]
+    return inputs_without_bb, inputs_with_bb
 
-        print("Extracting UST")
-        ust = post_data["UST"]
-        
-        print (ust)
-        labels_with_ids = []
-        print ("Extracting recordings...")
-        ii = 0
-        for recording in post_data["Recordings"]:
+def prepareRecordingInputs(a_recording):
+    inputs_without_bb, inputs_with_bb = getRecordingInputs(a_recording)
+    return {"inputs_without_bb": inputs_without_bb, "formatted_inputs": formatInputsWithBB(inputs_with_bb)}
+
+def getPreparedInputs(a_recording):
+    """
+    Returns the extraction inputs of a recording from prepared_input_cache, preparing them on a miss
+    
+    Returns:
+        dict: "inputs_without_bb", the free text input names, and "formatted_inputs", the dropdown
+        inputs as returned by formatInputsWithBB. Shared between requests, do not modify.
+    """
+    return prepared_input_cache.get_or_prepare(a_recording, prepareRecordingInputs)
+
+def extractInputValues(selected_recordings, ust, max_workers=EXTRACTION_MAX_WORKERS):
+    """
+    Runs the per-recording extraction calls concurrently on a bounded thread pool
+    
+    Args:
+        selected_recordings (iterable): Ranked recordings, each with "recording", "recording_id" and "matched_recording_label".
+            Calls for each recording are submitted as soon as the iterable yields it.
+        ust (str): The User Search Term
+        max_workers (int): Maximum number of extraction calls in flight at once
+    
+    Returns:
+        list: Matched recordings with their inputValues, in the same order as selected_recordings
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = []
+        for selected in selected_recordings:
+            prepared = getPreparedInputs(selected["recording"])
+            inputs_without_bb, formatted_inputs = prepared["inputs_without_bb"], prepared["formatted_inputs"]
+            without_bb_future = submitInContext(executor, getInputValuesWithoutBB, inputs_without_bb, ust) if inputs_without_bb else None
+            with_bb_future = submitInContext(executor, getInputValuesWithBB, formatted_inputs, ust, selected["recording"]["Recording_Labels"]) if formatted_inputs else None
+            pending.append((selected, without_bb_future, with_bb_future))
+
+        matched_recordings = []
+        for selected, without_bb_future, with_bb_future in pending:
+            inputWithoutBBValues = without_bb_future.result() if without_bb_future else []
+            inputWithBBValues = with_bb_future.result() if with_bb_future else []
+            matched_recordings.append({
+                "recording_id": selected["recording_id"],
+                "matched_recording_label": selected["matched_recording_label"],
+                "inputValues": inputWithoutBBValues + inputWithBBValues
+            })
+    return matched_recordings
+
+async def extractInputValuesAsync(selected_recordings, ust, max_workers=EXTRACTION_MAX_WORKERS):
+    """
+    Async variant of extractInputValues, running the extraction calls as concurrent tasks
+
+    At most max_workers calls are in flight at once, results keep the order of selected_recordings.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    async def noInputs():
+        return []
+
+    calls = []
+    for selected in selected_recordings:
+        prepared = getPreparedInputs(selected["recording"])
+        inputs_without_bb, formatted_inputs = prepared["inputs_without_bb"], prepared["formatted_inputs"]
+        calls.append(bounded(getInputValuesWithoutBBAsync(inputs_without_bb, ust)) if inputs_without_bb else noInputs())
+        calls.append(bounded(getInputValuesWithBBAsync(formatted_inputs, ust, selected["recording"]["Recording_Labels"])) if formatted_inputs else noInputs())
+    results = await asyncio.gather(*calls)
+
+    matched_recordings = []
+    for position, selected in enumerate(selected_recordings):
+        matched_recordings.append({
+            "recording_id": selected["recording_id"],
+            "matched_recording_label": selected["matched_recording_label"],
+            "inputValues": results[2 * position] + results[2 * position + 1]
+        })
+    return matched_recordings
+
+def trimEachRecording(step):
+    # Applies an input trim step to the dropdown inputs of every (recording key, inputs) pair of a batched prompt
+    return lambda recordings: [(recording_key, dict(pending, inputs_with_possible_values=step(pending["inputs_with_possible_values"])))
+                               for recording_key, pending in recordings]
+
+def prepareBatchedExtraction(selected_recordings, ust):
+    """
+    Builds the single prompt covering the inputs of all selected recordings, with the instructions
+    and the recordings' inputs in the cached system prompt and the UST in the user prompt
+    
+    Args:
+        selected_recordings (list): Ranked recordings, each with "recording", "recording_id" and "matched_recording_label"
+        ust (str): The User Search Term
+    
+    Returns:
+        tuple: The system prompt and the user prompt (both None when every input was resolved locally),
+        the expected input names and the locally resolved values, both keyed by recording id
+    """
+    recordings_inputs = {}
+    expected_inputs = {}
+    resolved_values = {}
+    for selected in selected_recordings:
+        prepared = getPreparedInputs(selected["recording"])
+        inputs_without_bb, formatted_inputs = prepared["inputs_without_bb"], prepared["formatted_inputs"]
+        recording_key = str(selected["recording_id"])
+        resolved_values[recording_key], unresolved_inputs = resolveInputsLocally(formatted_inputs, ust, selected["recording"]["Recording_Labels"])
+        recordings_inputs[recording_key] = {
+            "variables": inputs_without_bb,
+            "inputs_with_possible_values": prefilterInputs(unresolved_inputs, ust)
+        }
+        expected_inputs[recording_key] = inputs_without_bb + [formatted_input["input_name"] for formatted_input in formatted_inputs]
+
+    if not any(pending["variables"] or pending["inputs_with_possible_values"] for pending in recordings_inputs.values()):
+        return None, None, expected_inputs, resolved_values
+
+    def render(recordings):
+        return f"""
+    You extract the inputs of the following recordings, keyed by recording id, each with free text "variables" and "inputs_with_possible_values":
+    {prompt_builder.compact_json({recording_key: dict(pending, inputs_with_possible_values=getPromptInputs(pending["inputs_with_possible_values"]))
+                                  for recording_key, pending in recordings})}
+    
+    Each of the possible_values is a [possible_value_id, possible_value_text] row, followed by its option group when it has one.
+    
+    For every recording, handle each of its inputs:
+    - For each entry in "variables", provide the extracted value if found in the query.
+    - For each entry in "inputs_with_possible_values", search for the most appropriate possible_value_text based on the user query and return the corresponding possible_value_id. Use the input_metadata to help you understand the context of the input_name. Be very strict when it comes to matching Human Names.
+    If the information is not present, set "found" to "False" and "InputValue" to an empty string.
+    
+    Format your response as a JSON object keyed by recording id, like this:
+    {{
+        "<recording id>": [
+            {{
+                "Input": "input_name",
+                "found": "True",
+                "InputValue": "extracted value or possible_value_id"
+            }},
+            ...
+        ],
+        ...
+    }}
+    
+    Only provide the JSON object as your response, without any additional explanation.
+    """
+    trim_steps = [(name, trimEachRecording(step)) for name, step in prompt_builder.INPUT_TRIM_STEPS]
+    system, _ = prompt_builder.fit_to_budget(render, list(recordings_inputs.items()), trim_steps)
+    prompt = f"""
+    User query:
+    "{ust}"
+    """
+    # The recordings come from this UST's ranking, so the system prompt is not worth caching
+    system, prompt = getPromptParts(system, prompt, cacheable=False)
+    return system, prompt, expected_inputs, resolved_values
+
+def splitBatchedValues(selected_recordings, expected_inputs, resolved_values, batched_values):
+    if not isinstance(batched_values, dict):
+        # A malformed answer leaves every input not found rather than failing the request
+        batched_values = {}
+    matched_recordings = []
+    for selected in selected_recordings:
+        recording_key = str(selected["recording_id"])
+        values_by_input = {value["Input"]: value for value in batched_values.get(recording_key, []) if "Input" in value}
+        values_by_input.update(resolved_values[recording_key])
+        inputValues = [values_by_input.get(input_name, {"Input": input_name, "found": "False", "InputValue": ""})
+                       for input_name in expected_inputs[recording_key]]
+        matched_recordings.append({
+            "recording_id": selected["recording_id"],
+            "matched_recording_label": selected["matched_recording_label"],
+            "inputValues": inputValues
+        })
+    return matched_recordings
+
+@request_metrics.timed("extract_batched")
+def getInputValuesBatched(selected_recordings, ust):
+    """
+    Extracts the inputs of all selected recordings with a single LLM call
+    
+    Args:
+        selected_recordings (list): Ranked recordings, each with "recording", "recording_id" and "matched_recording_label"
+        ust (str): The User Search Term
+    
+    Returns:
+        list: Matched recordings with their inputValues, in the same order as selected_recordings
+    """
+    system, prompt, expected_inputs, resolved_values = prepareBatchedExtraction(selected_recordings, ust)
+    batched_values = call_llm(prompt, modelIdNonTrivial, system=system) if prompt else {}
+    return splitBatchedValues(selected_recordings, expected_inputs, resolved_values, batched_values)
+
+@request_metrics.timed("extract_batched")
+async def getInputValuesBatchedAsync(selected_recordings, ust):
+    system, prompt, expected_inputs, resolved_values = prepareBatchedExtraction(selected_recordings, ust)
+    batched_values = await call_llm_async(prompt, modelIdNonTrivial, system=system) if prompt else {}
+    return splitBatchedValues(selected_recordings, expected_inputs, resolved_values, batched_values)
+
+def normalizeUST(ust):
+    # Case, punctuation and whitespace differences do not change the answer
+    return " ".join(re.sub(r"[^\w\s]", " ", ust.lower()).split())
+
+def getResponseCacheKey(ust, post_data):
+    catalog = json.dumps(post_data["Recordings"], sort_keys=True, separators=(",", ":"))
+    return (
+        normalizeUST(ust),
+        hashlib.sha256(catalog.encode()).hexdigest(),
+        # Request options that change what the pipeline returns
+        str(post_data.get("top_k", RANKING_TOP_K)),
+        str(post_data.get("shortlist_top_n", SHORTLIST_TOP_N)),
+        str(post_data.get("shortlist_scorer", SHORTLIST_SCORER)),
+        str(post_data.get("batched_extraction", BATCHED_EXTRACTION)).lower()
+    )
+
+def parseEvent(event):
+    # Check if the body is in the event
+    if 'body' in event:
+        print ("Body found in event")
+        # If the body is a string, parse it as JSON
+        if isinstance(event['body'], str):
+            return json.loads(event['body'])
+        return event['body']
+    if isinstance(event, str):
+        return json.loads(event)
+    return event
+
+def prepareRequest(post_data):
+    """
+    Reads the request options, answers from the response cache when possible and builds the ranking input
+    
+    Args:
+        post_data (dict): The parsed request body
+    
+    Returns:
+        dict: Request state shared by the sync and async pipelines. "cached_body" holds the
+        response body when the request was answered from the response cache.
+    """
+    llm_cache_bypass.set(str(post_data.get("bypass_cache", "false")).lower() == "true")
+    print("Extracting UST")
+    ust = post_data["UST"]
+    
+    logDebug(ust)
+    request = {
+        "post_data": post_data,
+        "ust": ust,
+        "top_k": int(post_data.get("top_k", RANKING_TOP_K)),
+        "max_workers": int(post_data.get("max_workers", EXTRACTION_MAX_WORKERS)),
+        "batched_extraction": str(post_data.get("batched_extraction", BATCHED_EXTRACTION)).lower() == "true",
+        "stream_ranking": str(post_data.get("stream_ranking", STREAM_RANKING)).lower() == "true",
+        "debug": str(post_data.get("debug", "false")).lower() == "true",
+        "cached_body": None
+    }
+    request["use_response_cache"] = not llm_cache_bypass.get() and not request["debug"]
+    if request["use_response_cache"]:
+        request["response_cache_key"] = getResponseCacheKey(ust, post_data)
+        cached_result = response_cache.get(request["response_cache_key"])
+        if cached_result is not None:
+            matched_recordings, omitted_candidates = cached_result
+            request["cached_body"] = getStitchedResponse(ust, matched_recordings, omitted_candidates)
+            return request
+
+    shortlist_top_n = int(post_data.get("shortlist_top_n", SHORTLIST_TOP_N))
+    request["shortlist_scorer"] = post_data.get("shortlist_scorer", SHORTLIST_SCORER)
+    with request_metrics.stage("shortlist"):
+        shortlisted_ids, request["shortlist_scores"] = recording_index.shortlist_recordings(ust, post_data["Recordings"], shortlist_top_n, request["shortlist_scorer"])
+    labels_with_ids = []
+    print ("Extracting recordings...")
+    with request_metrics.stage("flatten_labels"):
+        for ii in shortlisted_ids:
+            recording = post_data["Recordings"][ii]
             for label in recording["Recording_Labels"]:
                 labels_with_ids.append({
                     "serial_id": ii,
                     "recording_id": recording["Recording_Id"],
                     "label": label
                 })
-            ii+=1
-        list_of_recordings = json.dumps(labels_with_ids, indent=2)
-        #print ("list of recordings")
-        #print (list_of_recordings)
+    request["list_of_recordings"] = labels_with_ids
+    # A shortlist depends on the UST, only the whole catalog is worth caching in the ranking prompt
+    request["catalog_cacheable"] = len(shortlisted_ids) == len(post_data["Recordings"])
+    #print ("list of recordings")
+    #print (request["list_of_recordings"])
+    return request
 
-        print ("Getting ranked list of labels...")
-        ranked_list = getRankedList(ust,list_of_recordings)
-        
-        #print("Ranked list of recordings:")
-        #print(json.dumps(ranked_list, indent=2))
-    except json.JSONDecodeError as e:
-        return {
-            'statusCode': 400,
-            'body': json.dumps({'error': f'Invalid JSON in request body: {str(e)}'})
-        }
-    except Exception as e:
-        return {
-            'statusCode': 400,
-            'body': json.dumps({'error': f'Error processing request: {str(e)} : {event}'})
-        }
-    matched_recordings = []
+def iterSelectedRecordings(post_data, ranked_list, top_k):
+    # Works on a streamed ranked list too, each recording is yielded as soon as its entry arrives
     seen_recording_ids = set()
-    for rank, item in enumerate(ranked_list, 1):
-            selected_index = item['selected_index']
-            selected_recording_id = item['selected_recording_id']
-            selected_label = item['selected_label']
-            if selected_recording_id in seen_recording_ids:
-                continue
-            seen_recording_ids.add(selected_recording_id)
-
-            a_recording = post_data["Recordings"][int(selected_index)]
-            inputs_without_bb = [input_data["Input"] for input_data in a_recording["Expected_User_Input"] if "html_content" not in input_data]
-            
-            inputWithoutBBValues = getInputValuesWithoutBB(inputs_without_bb, ust) if inputs_without_bb else []
-            #inputs_with_bb = [{input_data["Input"]: input_data["html_content"]} for input_data in a_recording["Expected_User_Input"] if "html_content"  in input_data]
-            inputs_with_bb = [{
-                input_data["Input"]: {
-                    "html_content": input_data["html_content"],
-                    "input_metadata": input_data.get("input_metadata", "")
+    try:
+        for rank, item in enumerate(ranked_list, 1):
+                selected_index = item['selected_index']
+                selected_recording_id = item['selected_recording_id']
+                selected_label = item['selected_label']
+                if selected_recording_id in seen_recording_ids:
+                    continue
+                seen_recording_ids.add(selected_recording_id)
+
+                yield {
+                    "recording": post_data["Recordings"][int(selected_index)],
+                    "recording_id": selected_recording_id,
+                    "matched_recording_label": selected_label
                 }
-            } for input_data in a_recording["Expected_User_Input"] if "html_content" in input_data]
+                if top_k > 0 and len(seen_recording_ids) >= top_k:
+                    break
+    finally:
+        # Close a streamed ranking as soon as selection stops, so the model stops writing ranks nobody reads
+        if hasattr(ranked_list, "close"):
+            ranked_list.close()
 
-            inputWithBBValues = getInputValuesWithBB(inputs_with_bb, ust)
-            inputValues = inputWithoutBBValues + inputWithBBValues
-            matched_recordings.append({
-                "recording_id": selected_recording_id,
-                "matched_recording_label": selected_label,
-                "inputValues": inputValues
-            })
-            '''print(f"Rank {rank}:")
-            print(f"  Selected Index: {selected_index}")
-            print(f"  Recording ID: {selected_recording_id}")
-            print(f"  Label: {selected_label}")
-            print(f"  Inputs: {inputs}")
-            print(f"  Input Values: {inputValues}")
-            print()
-            '''
+def selectRankedRecordings(post_data, ranked_list, top_k):
+    return list(iterSelectedRecordings(post_data, ranked_list, top_k))
 
+@request_metrics.timed("stitching")
+def finishRequest(request, matched_recordings):
+    post_data = request["post_data"]
     #print(f"Matched Recordings: {matched_recordings}")
     matched_recordings = rerankMatchedRecordingsBasedOnInputsFound(matched_recordings)
-    response = getStitchedResponse(ust, matched_recordings)
-    print ("Stitched response")
-    print (response)
-    print ("After Stringification")
-    print (json.dumps(response))
+    omitted_candidates = max(0, len(post_data["Recordings"]) - len(matched_recordings))
+    debug = None
+    if request["debug"]:
+        debug = {
+            "shortlist_scorer": request["shortlist_scorer"],
+            "shortlist_scores": {str(post_data["Recordings"][serial_id]["Recording_Id"]): score
+                                 for serial_id, score in request["shortlist_scores"].items()},
+            "llm_cache": llm_cache.stats(),
+            "response_cache": response_cache.stats(),
+            "llm_router": endpoint_router.snapshot(),
+            "token_usage": test_anthropic3.token_usage.snapshot(),
+            "prepared_input_cache": prepared_input_cache.stats(),
+            "llm_single_flight": llm_single_flight.stats(),
+            "extraction_batcher": extraction_batcher.stats(),
+            # Up to the start of stitching, the request log line has the complete metrics
+            "metrics": request_metrics.current().summary() if request_metrics.current() else None
+        }
+    response = getStitchedResponse(request["ust"], matched_recordings, omitted_candidates, debug)
+    if request["use_response_cache"]:
+        response_cache.put(request["response_cache_key"], (matched_recordings, omitted_candidates), len(response))
+    logDebug("Stitched response:", response)
     #response = simplifyJson(response)
 
     #print(f"Stitched Response: {response}")    
@@ -302,6 +1158,150 @@ def lambda_handler(event, context):
         'body': response
     }
 
+def logDebug(*values):
+    # Request and response payloads are only printed at LOG_LEVEL=DEBUG
+    if LOG_LEVEL == "DEBUG":
+        print(*values)
+
+def lambda_handler(event, context):
+    if ASYNC_PIPELINE:
+        return test_anthropic3.run_coroutine(lambda_handler_async(event, context))
+    metrics = request_metrics.start()
+    # Emitted in finally so a request failing outside the handler's own error handling still logs its one line
+    properties = {"status_code": 500, "pipeline": "sync"}
+    try:
+        result = handleRequest(event)
+        properties["status_code"] = result.get("statusCode")
+        return result
+    except Exception as e:
+        properties["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        request_metrics.emit(metrics, properties)
+
+def errorResponse(e):
+    if isinstance(e, json.JSONDecodeError):
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': f'Invalid JSON in request body: {str(e)}'})
+        }
+    return {
+        'statusCode': 400,
+        'body': json.dumps({'error': f'Error processing request: {str(e)}'})
+    }
+
+def startRankedStream(ranked_stream, errors):
+    """
+    Reads the first entry of a streamed ranked list, so a failing ranking call raises here
+    
+    Args:
+        ranked_stream (generator): Entries yielded by streamRankedList
+        errors (list): Collects the errors the stream raises after its first entry
+    
+    Returns:
+        generator: All entries of the stream, closing it closes the stream
+    """
+    first_entries = list(itertools.islice(ranked_stream, 1))
+
+    def entries():
+        try:
+            yield from first_entries
+            yield from ranked_stream
+        except Exception as e:
+            errors.append(e)
+            raise
+        finally:
+            ranked_stream.close()
+    return entries()
+
+def handleRequest(event):
+    ranking_errors = []
+    try:
+        with request_metrics.stage("parse_event"):
+            post_data = parseEvent(event)
+        request = prepareRequest(post_data)
+        if request["cached_body"] is not None:
+            return {
+                'statusCode': 200,
+                'body': request["cached_body"]
+            }
+
+        print ("Getting ranked list of labels...")
+        with request_metrics.stage("ranking"):
+            if request["stream_ranking"] and not request["batched_extraction"]:
+                ranked_list = startRankedStream(streamRankedList(request["ust"], request["list_of_recordings"], request["top_k"], request["catalog_cacheable"]), ranking_errors)
+            else:
+                ranked_list = getRankedList(request["ust"], request["list_of_recordings"], request["top_k"], request["catalog_cacheable"])
+        
+        #print("Ranked list of recordings:")
+        #print(json.dumps(ranked_list, indent=2))
+    except Exception as e:
+        return errorResponse(e)
+    try:
+        with request_metrics.stage("extraction"):
+            if request["batched_extraction"]:
+                selected_recordings = selectRankedRecordings(post_data, ranked_list, request["top_k"])
+                matched_recordings = getInputValuesBatched(selected_recordings, request["ust"])
+            else:
+                # extractInputValues submits each recording as it is selected, which overlaps extraction with a streamed ranking
+                selected_recordings = iterSelectedRecordings(post_data, ranked_list, request["top_k"])
+                matched_recordings = extractInputValues(selected_recordings, request["ust"], request["max_workers"])
+    except Exception as e:
+        # A streamed ranking failing after its first entry is reported like any other failed ranking
+        if any(e is error for error in ranking_errors):
+            return errorResponse(e)
+        raise
+    return finishRequest(request, matched_recordings)
+
+async def lambda_handler_async(event, context):
+    """
+    Async variant of lambda_handler, running ranking and extraction calls as tasks on the event loop
+    
+    Args:
+        event (dict): The Lambda event, same shapes as lambda_handler accepts
+        context: The Lambda context (unused)
+    
+    Returns:
+        dict: Response with statusCode and body, same as lambda_handler
+    """
+    metrics = request_metrics.start()
+    # Emitted in finally so a request failing outside the handler's own error handling still logs its one line
+    properties = {"status_code": 500, "pipeline": "async"}
+    try:
+        result = await handleRequestAsync(event)
+        properties["status_code"] = result.get("statusCode")
+        return result
+    except Exception as e:
+        properties["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        request_metrics.emit(metrics, properties)
+
+async def handleRequestAsync(event):
+    try:
+        with request_metrics.stage("parse_event"):
+            post_data = parseEvent(event)
+        request = prepareRequest(post_data)
+        if request["cached_body"] is not None:
+            return {
+                'statusCode': 200,
+                'body': request["cached_body"]
+            }
+
+        print ("Getting ranked list of labels...")
+        with request_metrics.stage("ranking"):
+            ranked_list = await getRankedListAsync(request["ust"], request["list_of_recordings"], request["top_k"], request["catalog_cacheable"])
+    except Exception as e:
+        return errorResponse(e)
+    selected_recordings = selectRankedRecordings(post_data, ranked_list, request["top_k"])
+
+    with request_metrics.stage("extraction"):
+        if request["batched_extraction"]:
+            matched_recordings = await getInputValuesBatchedAsync(selected_recordings, request["ust"])
+        else:
+            matched_recordings = await extractInputValuesAsync(selected_recordings, request["ust"], request["max_workers"])
+    return finishRequest(request, matched_recordings)
+
 
 def main():
     dummy_event = {"UST":"show me issues assigned to Prerna","Recordings":[{"Recording_Id":4736,"Recording_Labels":["Show me issues for Yuresh"],"Expected_User_Input":[{"Input":"dropdown","input_metadata":"This is for selecting the drop list for users","html_element_type":"dropDown","html_content":"\"<select id=\\\"add_filter_select\\\"><option value=\\\"\\\">&nbsp;</option>\\n<option value=\\\"status_id\\\" disabled=\\\"disabled\\\">Status</option>\\n<option value=\\\"tracker_id\\\">Tracker</option>\\n<option value=\\\"priority_id\\\">Priority</option>\\n<option value=\\\"author_id\\\">Author</option>\\n<option value=\\\"assigned_to_id\\\" disabled=\\\"disabled\\\">Assignee</option>\\n<option value=\\\"fixed_version_id\\\">Target version</option>\\n<option value=\\\"category_id\\\">Category</option>\\n<option value=\\\"subject\\\">Subject</option>\\n<option value=\\\"description\\\">Description</option>\\n<option value=\\\"done_ratio\\\">% Done</option>\\n<option value=\\\"is_private\\\">Private</option>\\n<option value=\\\"attachment\\\">File</option>\\n<option value=\\\"watcher_id\\\">Watcher</option>\\n<option value=\\\"updated_by\\\">Updated by</option>\\n<option value=\\\"last_updated_by\\\">Last updated by</option>\\n<option value=\\\"subproject_id\\\">Subproject</option>\\n<option value=\\\"issue_id\\\">Issue</option><optgroup label=\\\"Assignee\\\"><option value=\\\"member_of_group\\\">Assignee's group</option>\\n<option value=\\\"assigned_to_role\\\">Assignee's role</option></optgroup><optgroup label=\\\"Target version\\\"><option value=\\\"fixed_version.due_date\\\">Target version's Due date</option>\\n<option value=\\\"fixed_version.status\\\">Target version's Status</option></optgroup><optgroup label=\\\"Date\\\"><option value=\\\"created_on\\\">Created</option>\\n<option value=\\\"updated_on\\\">Updated</option>\\n<option value=\\\"closed_on\\\">Closed</option>\\n<option value=\\\"start_date\\\">Start date</option>\\n<option value=\\\"due_date\\\">Due date</option></optgroup><optgroup label=\\\"Time tracking\\\"><option value=\\\"estimated_hours\\\">Estimated time</option>\\n<option value=\\\"spent_time\\\">Spent time</option></optgroup><optgroup label=\\\"Project\\\"><option value=\\\"project.status\\\">Project's Status</option></optgroup><optgroup label=\\\"Relations\\\"><option value=\\\"relates\\\">Related to</option>\\n<option value=\\\"duplicates\\\">Is duplicate of</option>\\n<option value=\\\"duplicated\\\">Has duplicate</option>\\n<option value=\\\"blocks\\\">Blocks</option>\\n<option value=\\\"blocked\\\">Blocked by</option>\\n<option value=\\\"precedes\\\">Precedes</option>\\n<option value=\\\"follows\\\">Follows</option>\\n<option value=\\\"copied_to\\\">Copied to</option>\\n<option value=\\\"copied_from\\\">Copied from</option>\\n<option value=\\\"parent_id\\\">Parent task</option>\\n<option value=\\\"child_id\\\">Subtasks</option></optgroup></select>\""},{"Input":"condition","input_metadata":"This is for applying the condition for certain user condition","html_element_type":"dropDown","html_content":"\"<select id=\\\"operators_assigned_to_id\\\" name=\\\"op[assigned_to_id]\\\"><option value=\\\"=\\\">is</option><option value=\\\"!\\\">is not</option><option value=\\\"!\\\">none</option><option value=\\\"\\\">any</option></select>\""},{"Input":"dropdown_user","input_metadata":"This is for selecting user from the list","html_element_type":"dropDown","html_content":"\"<select class=\\\"value\\\" id=\\\"values_assigned_to_id_1\\\" name=\\\"v[assigned_to_id][]\\\"><option value=\\\"me\\\">&lt;&lt; me &gt;&gt;</option><optgroup label=\\\"active\\\"><option value=\\\"86\\\">Aakash Entab</option><option value=\\\"99\\\">Abhishek Mathur</option><option value=\\\"8\\\">ajay k</option><option value=\\\"84\\\">Bhushan Entab</option><option value=\\\"87\\\">Ganesh Chandu</option><option value=\\\"12\\\">Haritha C</option><option value=\\\"83\\\">Jitendar Kumar</option><option value=\\\"82\\\">Jitendar Sharma</option><option value=\\\"64\\\">Lakshman Veti</option><option value=\\\"45\\\">Moen Ediga</option><option value=\\\"22\\\">Nagamunemma T</option><option value=\\\"88\\\">Navya Nimmagadda</option><option value=\\\"81\\\">Raju Kamireddy</option><option value=\\\"5\\\">Ramakrishna Krishnamsetty</option><option value=\\\"85\\\">Sandhya Entab</option><option value=\\\"65\\\">TBD TBD</option><option value=\\\"75\\\">Tej Reddy</option><option value=\\\"36\\\">Yureshwar Ravuri</option></optgroup><optgroup label=\\\"locked\\\"><option value=\\\"76\\\">Amith Bachuwala</option><option value=\\\"71\\\">ashwini indukande</option><option value=\\\"66\\\">Atul Arora</option><option value=\\\"9\\\">Dharani Reddy</option><option value=\\\"68\\\">Praveen Dodda</option><option value=\\\"54\\\">Ragavan K</option><option value=\\\"70\\\">Rama Krishna Mundru</option><option value=\\\"69\\\">Sunil Gutta</option><option value=\\\"102\\\">Udan Public</option></optgroup><option value=\\\"36\\\">Yureshwar Ravuri</option></select>\""}]},{"Recording_Id":4551,"Recording_Labels":["Show me issues in Features project","Navigate me to Features project issues","Features project issues"],"Expected_User_Input":[{"Input":"ProjectTitle","input_metadata":"This is for project name","html_element_type":"link","html_content":"\"<a class=\\\"project child leaf\\\" href=\\\"/projects/features\\\">Features</a>\""},{"Input":"ProjectNavigation","input_metadata":"This is for navigating under project","html_element_type":"link","html_content":"\"<a class=\\\"issues\\\" href=\\\"/projects/features/issues\\\">Issues</a>\""}]},{"Recording_Id":4543,"Recording_Labels":["Show me assigned issues of ajay in Digital Assistant project"],"Expected_User_Input":[{"Input":"project_name","input_metadata":"This is for project name field","html_element_type":"link","html_content":"\"<a class=\\\"project root parent\\\" href=\\\"/projects/digital-assistant\\\">Digital Assistant</a>\""},{"Input":"task","input_metadata":"this is for what kind of category","html_element_type":"link","html_content":"\"<a class=\\\"issues\\\" href=\\\"/projects/digital-assistant/issues\\\">Issues</a>\""},{"Input":"user_name","input_metadata":"this is for selecting username","html_element_type":"dropDown","html_content":"\"<select class=\\\"value\\\" id=\\\"values_assigned_to_id_1\\\" name=\\\"v[assigned_to_id][]\\\"><option value=\\\"me\\\">&lt;&lt; me &gt;&gt;</option><optgroup label=\\\"active\\\"><option value=\\\"86\\\">Aakash Entab</option><option value=\\\"99\\\">Abhishek Mathur</option><option value=\\\"8\\\">ajay k</option><option value=\\\"84\\\">Bhushan Entab</option><option value=\\\"87\\\">Ganesh Chandu</option><option value=\\\"12\\\">Haritha C</option><option value=\\\"83\\\">Jitendar Kumar</option><option value=\\\"82\\\">Jitendar Sharma</option><option value=\\\"64\\\">Lakshman Veti</option><option value=\\\"45\\\">Moen Ediga</option><option value=\\\"22\\\">Nagamunemma T</option><option value=\\\"88\\\">Navya Nimmagadda</option><option value=\\\"81\\\">Raju Kamireddy</option><option value=\\\"5\\\">Ramakrishna Krishnamsetty</option><option value=\\\"85\\\">Sandhya Entab</option><option value=\\\"65\\\">TBD TBD</option><option value=\\\"75\\\">Tej Reddy</option><option value=\\\"36\\\">Yureshwar Ravuri</option></optgroup><optgroup label=\\\"locked\\\"><option value=\\\"76\\\">Amith Bachuwala</option><option value=\\\"71\\\">ashwini indukande</option><option value=\\\"66\\\">Atul Arora</option><option value=\\\"9\\\">Dharani Reddy</option><option value=\\\"68\\\">Praveen Dodda</option><option value=\\\"54\\\">Ragavan K</option><option value=\\\"70\\\">Rama Krishna Mundru</option><option value=\\\"69\\\">Sunil Gutta</option><option value=\\\"102\\\">Udan Public</option></optgroup><option value=\\\"36\\\">Yureshwar Ravuri</option></select>\""}]},{"Recording_Id":4552,"Recording_Labels":["Navigate me to Activity in Digital Assistant","Show me activity in Digital Assistant"],"Expected_User_Input":[{"Input":"ProjectTitle","input_metadata":"This is a name of a Project","html_element_type":"link","html_content":"\"<a class=\\\"project root parent public\\\" href=\\\"/projects/digital-assistant\\\">Digital Assistant</a>\""},{"Input":"ProjectNavigation","input_metadata":"This is for navigating under project","html_element_type":"link","html_content":"\"<a class=\\\"activity\\\" href=\\\"/projects/digital-assistant/activity\\\">Activity</a>\""}]}]}
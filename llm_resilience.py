@@ -0,0 +1,174 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Retries after the first attempt on 429, 5xx and network errors
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+
+# Fire a duplicate call when the first one is slower than this percentile of recent calls
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.5"))
+# "same" lets the router pick the endpoint for the duplicate call, "alternate" keeps it off the endpoint of the first call
+HEDGE_BACKEND = os.getenv("HEDGE_BACKEND", "same")
+HEDGE_MAX_WORKERS = int(os.getenv("HEDGE_MAX_WORKERS", "32"))
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def error_status(error: BaseException) -> Tuple[Optional[int], Optional[float]]:
+    """
+    Return the HTTP status and retry-after seconds carried by an LLM call error, if any.
+
+    Understands test_anthropic3.AnthropicAPIError and botocore ClientError.
+    """
+    status = getattr(error, "status", None)
+    retry_after = getattr(error, "retry_after", None)
+    response = getattr(error, "response", None)
+    if status is None and isinstance(response, dict):
+        metadata = response.get("ResponseMetadata", {})
+        status = metadata.get("HTTPStatusCode")
+        retry_after = parse_retry_after(metadata.get("HTTPHeaders", {}).get("retry-after"))
+    return status, retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a retry-after header given in seconds, ignoring HTTP-date values."""
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits, server errors and network failures are worth retrying, other errors are not."""
+    status, _ = error_status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or type(error).__module__.startswith("urllib3")
+
+
+def retry_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's retry-after."""
+    delay = random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def call_with_retry(fn: Callable[[], Any], max_retries: int = MAX_RETRIES) -> Any:
+    """Call fn, retrying retryable errors with jittered backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as error:
+            if attempt == max_retries or not is_retryable(error):
+                raise
+            _, retry_after = error_status(error)
+            time.sleep(retry_delay(attempt, retry_after))
+
+
+async def call_with_retry_async(fn: Callable[[], Awaitable[Any]], max_retries: int = MAX_RETRIES) -> Any:
+    """Async variant of call_with_retry."""
+    for attempt in range(max_retries + 1):
+        try:
+            return await fn()
+        except Exception as error:
+            if attempt == max_retries or not is_retryable(error):
+                raise
+            _, retry_after = error_status(error)
+            await asyncio.sleep(retry_delay(attempt, retry_after))
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies per backend."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, backend: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(backend, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, backend: str, percentile: float) -> Optional[float]:
+        """The given percentile of the recorded latencies, or None before HEDGE_MIN_SAMPLES calls."""
+        with self._lock:
+            samples = sorted(self._samples.get(backend, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def hedge_delay(self, backend: str) -> Optional[float]:
+        """How long to wait for a call on backend before hedging it, or None when hedging is off or not yet calibrated."""
+        if not HEDGE_ENABLED:
+            return None
+        latency = self.percentile(backend, HEDGE_PERCENTILE)
+        return None if latency is None else max(HEDGE_MIN_DELAY_SECONDS, latency)
+
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge")
+        return _hedge_executor
+
+
+def call_hedged(primary: Callable[[], Any], hedge: Callable[[], Any], delay: float) -> Any:
+    """
+    Run primary, and if it has not finished after delay seconds also run hedge; return whichever succeeds first.
+
+    A blocking HTTP call cannot be interrupted, so the slower call is cancelled if it has not
+    started yet and otherwise left to finish in the background with its result discarded.
+    """
+    executor = get_hedge_executor()
+    # Calls run in a copy of the caller's context so request-scoped context variables follow them
+    pending = {executor.submit(contextvars.copy_context().run, primary)}
+    done, _ = wait(pending, timeout=delay)
+    if not done:
+        pending.add(executor.submit(contextvars.copy_context().run, hedge))
+
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    loser.cancel()
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def call_hedged_async(primary: Callable[[], Awaitable[Any]], hedge: Callable[[], Awaitable[Any]], delay: float) -> Any:
+    """Async variant of call_hedged; the losing task is cancelled outright."""
+    pending = {asyncio.ensure_future(primary())}
+    done, _ = await asyncio.wait(pending, timeout=delay)
+    if not done:
+        pending.add(asyncio.ensure_future(hedge()))
+
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+    finally:
+        for loser in pending:
+            loser.cancel()
+    raise error
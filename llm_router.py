@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+# Consecutive failures that open an endpoint's circuit breaker
+FAILURE_THRESHOLD = int(os.getenv("ROUTER_FAILURE_THRESHOLD", "5"))
+# Seconds an open breaker waits before letting a single trial call through
+COOLDOWN_SECONDS = float(os.getenv("ROUTER_COOLDOWN_SECONDS", "30"))
+# Weight of the newest sample in the rolling latency and error rate averages
+EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", "0.2"))
+# How strongly a recent error rate counts against an endpoint's latency
+ERROR_PENALTY = float(os.getenv("ROUTER_ERROR_PENALTY", "4"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class EndpointStats:
+    """Rolling health of one endpoint, plus its circuit breaker state."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.routed = 0
+        self.successes = 0
+        self.failures = 0
+
+    def score(self) -> float:
+        # Endpoints without a latency sample yet score best, so every endpoint gets tried
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1 + ERROR_PENALTY * self.error_rate)
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "latency_ewma": self.latency,
+            "error_rate": round(self.error_rate, 4),
+            "routed": self.routed,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+class EndpointRouter:
+    """
+    Route each LLM call to the healthiest, fastest endpoint.
+
+    Endpoints are plain names such as "anthropic", "anthropic@http://localhost:8080/v1"
+    or "bedrock:us-east-1"; the caller knows how to invoke them. The router tracks a
+    rolling latency and error rate per endpoint and opens a circuit breaker on an endpoint
+    after FAILURE_THRESHOLD consecutive failures.
+    """
+
+    def __init__(self, endpoints: List[str]):
+        if not endpoints:
+            raise ValueError("EndpointRouter needs at least one endpoint")
+        self.endpoints = {name: EndpointStats(name) for name in endpoints}
+        self._lock = threading.Lock()
+
+    def choose(self, exclude: Iterable[str] = ()) -> str:
+        """
+        Pick the endpoint for the next call.
+
+        Args:
+            exclude: Endpoints to avoid, such as the one a hedged call is already running on
+
+        Returns:
+            The name of the endpoint with the best score among those whose breaker allows a call.
+            When every breaker is open the least recently opened endpoint is used anyway.
+        """
+        excluded = set(exclude)
+        now = time.monotonic()
+        with self._lock:
+            candidates = [stats for name, stats in self.endpoints.items() if name not in excluded] or list(self.endpoints.values())
+            available = [stats for stats in candidates if self._allows_call(stats, now)]
+            if available:
+                chosen = min(available, key=EndpointStats.score)
+            else:
+                chosen = min(candidates, key=lambda stats: stats.opened_at)
+            if chosen.state == HALF_OPEN:
+                chosen.trial_in_flight = True
+            chosen.routed += 1
+            return chosen.name
+
+    def record_success(self, name: str, seconds: Optional[float]) -> None:
+        # seconds is None for a call the caller stopped reading early, its partial latency would skew the average
+        with self._lock:
+            stats = self.endpoints[name]
+            if seconds is not None:
+                stats.latency = seconds if stats.latency is None else (1 - EWMA_ALPHA) * stats.latency + EWMA_ALPHA * seconds
+            stats.error_rate = (1 - EWMA_ALPHA) * stats.error_rate
+            stats.consecutive_failures = 0
+            stats.successes += 1
+            stats.state = CLOSED
+            stats.trial_in_flight = False
+
+    def record_failure(self, name: str) -> None:
+        with self._lock:
+            stats = self.endpoints[name]
+            stats.error_rate = (1 - EWMA_ALPHA) * stats.error_rate + EWMA_ALPHA
+            stats.consecutive_failures += 1
+            stats.failures += 1
+            stats.trial_in_flight = False
+            if stats.state == HALF_OPEN or stats.consecutive_failures >= FAILURE_THRESHOLD:
+                stats.state = OPEN
+                stats.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Per-endpoint routing counts, health and breaker state, for metrics and debugging."""
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in self.endpoints.items()}
+
+    @staticmethod
+    def _allows_call(stats: EndpointStats, now: float) -> bool:
+        if stats.state == CLOSED:
+            return True
+        if stats.state == OPEN and now - stats.opened_at >= COOLDOWN_SECONDS:
+            stats.state = HALF_OPEN
+        return stats.state == HALF_OPEN and not stats.trial_in_flight
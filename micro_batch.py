@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+
+class _Batch:
+    def __init__(self):
+        self.items: List[Any] = []
+        self.futures: List[Future] = []
+        self.closed = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Collect items submitted concurrently over a short window and process them in one call.
+
+    The first caller of a batch waits up to window_seconds (less when max_batch_size items
+    arrive first), then runs run_batch on every item collected so far; each caller gets the
+    result at its own position. The batch runs on its first caller's thread, so no background
+    thread is needed.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Any]], List[Any]], window_seconds: float, max_batch_size: int):
+        """
+        Args:
+            run_batch: Processes a list of items and returns their results in the same order
+            window_seconds: How long the first item of a batch waits for company
+            max_batch_size: Items at which a batch is run without waiting for the window to end
+        """
+        self.run_batch = run_batch
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: Optional[_Batch] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item: Any) -> Any:
+        """Add item to the open batch and block until its result is ready."""
+        future = Future()
+        with self._lock:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch()
+            batch.items.append(item)
+            batch.futures.append(future)
+            if len(batch.items) >= self.max_batch_size:
+                self._pending = None
+                batch.closed.set()
+
+        if leader:
+            batch.closed.wait(self.window_seconds)
+            with self._lock:
+                if self._pending is batch:
+                    self._pending = None
+                self.batches += 1
+                self.items += len(batch.items)
+            self._run(batch)
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            return {"batches": self.batches, "items": self.items}
+
+    def _run(self, batch: _Batch) -> None:
+        try:
+            results = self.run_batch(batch.items)
+        except Exception as error:
+            for future in batch.futures:
+                future.set_exception(error)
+            return
+        for future, result in zip(batch.futures, results):
+            future.set_result(result)
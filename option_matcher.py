@@ -0,0 +1,194 @@
+import os
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from recording_index import tokenize
+
+# Minimum similarity an option needs before it can be picked without the LLM
+MIN_MATCH_SCORE = float(os.getenv("FUZZY_MATCH_MIN_SCORE", "0.85"))
+# Lead the best option needs over the runner-up before it can be picked without the LLM
+MIN_MATCH_MARGIN = float(os.getenv("FUZZY_MATCH_MIN_MARGIN", "0.15"))
+
+# Dropdowns with more options than this only send their best candidates to the LLM
+PREFILTER_MIN_OPTIONS = int(os.getenv("OPTION_PREFILTER_MIN_OPTIONS", "50"))
+PREFILTER_TOP_N = int(os.getenv("OPTION_PREFILTER_TOP_N", "20"))
+# Best candidate score below which the pre-filter keeps the full option list
+PREFILTER_MIN_SCORE = float(os.getenv("OPTION_PREFILTER_MIN_SCORE", "0.5"))
+# Score of an option token that sounds like a UST token (same Soundex code) but is spelled differently
+PHONETIC_MATCH_SCORE = 0.6
+
+# Options such as "<< me >>", "Any" or "none" that no name in the UST matches but the LLM may still need
+SPECIAL_OPTION_PATTERN = re.compile(r"^\W*(me|myself|any|anyone|all|none|nobody|unassigned|not assigned|blank)\W*$", re.IGNORECASE)
+# Dropdowns of people or projects, the only ones resolved without the LLM: their metadata says so
+# and their options are keyed by record ids (filter field lists use symbolic ids such as "closed_on")
+NAME_METADATA_PATTERN = re.compile(r"\b(users?|user ?names?|assignees?|members?|owners?|authors?|projects?|names?)\b", re.IGNORECASE)
+RECORD_ID_PATTERN = re.compile(r"^\d+$")
+SOUNDEX_CODES = {char: str(code) for code, chars in enumerate(("bfpv", "cgjkqsxz", "dt", "l", "mn", "r"), 1) for char in chars}
+
+# Option words too common or too short to identify an option on their own
+STOPWORDS = {
+    "the", "and", "for", "with", "from", "not", "any", "none", "all", "show", "this", "that",
+}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def trigrams(token: str) -> Set[str]:
+    """Padded character trigrams of a token."""
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def token_similarity(a: str, b: str) -> float:
+    """Similarity of two tokens in [0, 1], the best of edit-distance and trigram Dice similarity."""
+    if a == b:
+        return 1.0
+    edit_similarity = 1 - edit_distance(a, b) / max(len(a), len(b))
+    trigrams_a, trigrams_b = trigrams(a), trigrams(b)
+    dice = 2 * len(trigrams_a & trigrams_b) / (len(trigrams_a) + len(trigrams_b))
+    return max(edit_similarity, dice)
+
+
+def soundex(token: str) -> str:
+    """American Soundex code of a token, e.g. "Prerna" and "Prarna" are both P650."""
+    letters = [char for char in token.lower() if char.isalpha()]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = SOUNDEX_CODES.get(letters[0], "")
+    for char in letters[1:]:
+        digit = SOUNDEX_CODES.get(char, "")
+        if digit and digit != previous:
+            code += digit
+        if char not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def significant_tokens(text: str) -> List[str]:
+    """Tokens of an option text that can identify it, i.e. not stopwords and at least 3 characters."""
+    return [token for token in tokenize(text) if len(token) >= 3 and token not in STOPWORDS]
+
+
+def option_score(ust_tokens: List[str], option_text: str) -> float:
+    """
+    Score how strongly the UST mentions an option.
+
+    The score is the best token similarity, plus a bonus of 0.25 for every further
+    option token that also clears MIN_MATCH_SCORE, so "Jitendar Kumar" beats
+    "Jitendar Sharma" for "jitendar kumar".
+    """
+    best_per_token = [
+        max((token_similarity(option_token, ust_token) for ust_token in ust_tokens), default=0.0)
+        for option_token in significant_tokens(option_text)
+    ]
+    if not best_per_token:
+        return 0.0
+    matched = sum(1 for similarity in best_per_token if similarity >= MIN_MATCH_SCORE)
+    return max(best_per_token) + 0.25 * max(0, matched - 1)
+
+
+def is_name_dropdown(input_metadata: str, possible_values: List[Dict]) -> bool:
+    """True for dropdowns picking a person or project, see NAME_METADATA_PATTERN."""
+    options = [option for option in possible_values if not is_special_option(option)]
+    if not options or not NAME_METADATA_PATTERN.search(input_metadata or ""):
+        return False
+    return 2 * sum(1 for option in options if RECORD_ID_PATTERN.match(option["possible_value_id"])) >= len(options)
+
+
+def resolve_option(ust: str, possible_values: List[Dict], label_tokens: Set[str] = frozenset()) -> Optional[str]:
+    """
+    Pick a dropdown option for the UST by string similarity alone.
+
+    Only UST tokens that are not in the recording's labels count, so words the UST shares
+    with the label it was ranked on ("issues", "project") never pick an option. A single
+    matched token is enough ("dharani" picks "Dharani Kumar") as long as no other option
+    matches about as well, e.g. "jitendar" with two Jitendars is left to the LLM.
+
+    Args:
+        ust: The User Search Term
+        possible_values: Options with "possible_value_id" and "possible_value_text"
+        label_tokens: Tokens of the recording's labels
+
+    Returns:
+        The possible_value_id of the option that wins with a clear margin, or None when
+        the choice is ambiguous and should be left to the LLM
+    """
+    ust_tokens = [token for token in tokenize(ust) if token not in label_tokens]
+    best_by_id = {}
+    for option in possible_values:
+        option_id = option["possible_value_id"]
+        score = option_score(ust_tokens, option["possible_value_text"])
+        best_by_id[option_id] = max(best_by_id.get(option_id, 0.0), score)
+
+    ranked = sorted(best_by_id.items(), key=lambda item: item[1], reverse=True)
+    if not ranked or ranked[0][1] < MIN_MATCH_SCORE:
+        return None
+    if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < MIN_MATCH_MARGIN:
+        return None
+    return ranked[0][0]
+
+
+def is_special_option(option: Dict) -> bool:
+    return bool(SPECIAL_OPTION_PATTERN.match(option["possible_value_text"]) or SPECIAL_OPTION_PATTERN.match(option["possible_value_id"]))
+
+
+def prefilter_options(ust: str, possible_values: List[Dict], top_n: int = PREFILTER_TOP_N) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Cut a large dropdown down to the options the UST could plausibly mean.
+
+    Options are scored by trigram Dice similarity and Soundex agreement with the UST tokens,
+    which is cheap enough for dropdowns with thousands of options. The top_n best options are
+    kept along with special options such as "<< me >>", "any" and "none", in their original order.
+
+    Args:
+        ust: The User Search Term
+        possible_values: Options with "possible_value_id" and "possible_value_text"
+        top_n: Number of scored candidates to keep
+
+    Returns:
+        The kept options and the dropped options. Small dropdowns, and dropdowns whose best
+        candidate scores below PREFILTER_MIN_SCORE, are kept whole.
+    """
+    if len(possible_values) <= max(PREFILTER_MIN_OPTIONS, top_n):
+        return possible_values, []
+    ust_tokens = [token for token in tokenize(ust) if len(token) >= 3 and token not in STOPWORDS]
+    ust_trigrams = [trigrams(token) for token in ust_tokens]
+    ust_codes = {soundex(token) for token in ust_tokens}
+
+    def candidate_score(option_text: str) -> float:
+        best = 0.0
+        for option_token in significant_tokens(option_text):
+            option_trigrams = trigrams(option_token)
+            for token_trigrams in ust_trigrams:
+                best = max(best, 2 * len(option_trigrams & token_trigrams) / (len(option_trigrams) + len(token_trigrams)))
+            if soundex(option_token) in ust_codes:
+                best = max(best, PHONETIC_MATCH_SCORE)
+        return best
+
+    scores = [0.0 if is_special_option(option) else candidate_score(option["possible_value_text"]) for option in possible_values]
+    if max(scores) < PREFILTER_MIN_SCORE:
+        return possible_values, []
+    best_positions = set(sorted((position for position, score in enumerate(scores) if score > 0), key=lambda position: -scores[position])[:top_n])
+    kept, dropped = [], []
+    for position, option in enumerate(possible_values):
+        if position in best_positions or is_special_option(option):
+            kept.append(option)
+        else:
+            dropped.append(option)
+    return kept, dropped
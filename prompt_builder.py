@@ -0,0 +1,126 @@
+import json
+import os
+import re
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# Estimated tokens a prompt may use before low-value content is trimmed, 0 disables trimming
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "60000"))
+# Length that input_metadata and recording labels are cut to when a prompt is over budget
+METADATA_MAX_CHARS = int(os.getenv("PROMPT_METADATA_MAX_CHARS", "200"))
+LABEL_MAX_CHARS = int(os.getenv("PROMPT_LABEL_MAX_CHARS", "200"))
+# Characters of a word that one token covers on average
+CHARS_PER_TOKEN = 4
+
+# Words, and every other non-space character on its own
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of text without a tokenizer.
+
+    Every word costs one token per CHARS_PER_TOKEN characters and every punctuation mark one
+    token, which tracks the Claude tokenizer closely enough for budgeting English text and JSON.
+    """
+    return sum(-(-len(piece) // CHARS_PER_TOKEN) for piece in TOKEN_PATTERN.findall(text))
+
+
+def compact_json(value: Any) -> str:
+    """Serialize value without indentation or spaces after separators."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def strip_template(text: str) -> str:
+    """Remove the indentation of an f-string template and collapse its runs of blank lines."""
+    text = "\n".join(line.strip() for line in text.strip().splitlines())
+    return BLANK_LINES_PATTERN.sub("\n\n", text)
+
+
+def log_prompt_size(model_id: str, system: str, prompt: str) -> None:
+    """Print the estimated size of one LLM call's prompt."""
+    text = system + prompt
+    print(f"Prompt size for {model_id}: ~{estimate_tokens(text)} tokens, {len(text)} chars")
+
+
+def fit_to_budget(render: Callable[[List], str], items: List, steps: Sequence[Tuple[str, Callable[[List], List]]],
+                  budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[str, List[str]]:
+    """
+    Render items, applying trim steps one after another until the text fits the budget.
+
+    Args:
+        render: Builds the prompt text from a list of items
+        items: The items to render; they are never modified, each step returns new ones
+        steps: Named functions trimming a list of items, cheapest loss of information first
+        budget: Estimated tokens allowed, 0 or less renders the items untrimmed
+
+    Returns:
+        The rendered text and the names of the steps that were applied
+    """
+    text = render(items)
+    applied = []
+    for name, step in steps:
+        if budget <= 0 or estimate_tokens(text) <= budget:
+            break
+        items = step(items)
+        applied.append(name)
+        text = render(items)
+    if applied:
+        print(f"Prompt over {budget} token budget, trimmed {', '.join(applied)}: ~{estimate_tokens(text)} tokens")
+    return text, applied
+
+
+def drop_duplicate_options(formatted_inputs: List[Dict]) -> List[Dict]:
+    """Keep the first option of every possible_value_id."""
+    trimmed = []
+    for formatted_input in formatted_inputs:
+        seen = set()
+        options = []
+        for option in formatted_input["possible_values"]:
+            if option["possible_value_id"] not in seen:
+                seen.add(option["possible_value_id"])
+                options.append(option)
+        trimmed.append(dict(formatted_input, possible_values=options))
+    return trimmed
+
+
+def shorten_metadata(formatted_inputs: List[Dict]) -> List[Dict]:
+    trimmed = []
+    for formatted_input in formatted_inputs:
+        metadata = formatted_input.get("input_metadata", "")
+        if not isinstance(metadata, str):
+            metadata = compact_json(metadata)
+        trimmed.append(dict(formatted_input, input_metadata=metadata[:METADATA_MAX_CHARS]))
+    return trimmed
+
+
+def drop_metadata(formatted_inputs: List[Dict]) -> List[Dict]:
+    return [{key: value for key, value in formatted_input.items() if key != "input_metadata"} for formatted_input in formatted_inputs]
+
+
+def drop_duplicate_labels(labels_with_ids: List[Dict]) -> List[Dict]:
+    """Keep the first of the labels that a recording repeats up to case and whitespace."""
+    seen = set()
+    trimmed = []
+    for entry in labels_with_ids:
+        key = (entry["recording_id"], " ".join(str(entry["label"]).lower().split()))
+        if key not in seen:
+            seen.add(key)
+            trimmed.append(entry)
+    return trimmed
+
+
+def shorten_labels(labels_with_ids: List[Dict]) -> List[Dict]:
+    return [dict(entry, label=str(entry["label"])[:LABEL_MAX_CHARS]) for entry in labels_with_ids]
+
+
+# Trim steps for formatted dropdown inputs and for the ranking catalog, in the order they are tried
+INPUT_TRIM_STEPS = (
+    ("duplicate options", drop_duplicate_options),
+    ("long input_metadata", shorten_metadata),
+    ("input_metadata", drop_metadata),
+)
+LABEL_TRIM_STEPS = (
+    ("duplicate labels", drop_duplicate_labels),
+    ("long labels", shorten_labels),
+)
@@ -0,0 +1,217 @@
+import hashlib
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import Dict, List, Tuple
+
+# NumPy, imported by load_numpy() when a semantic score is first needed since BM25 alone does not use it
+np = None
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Width of the hashed n-gram vectors used by the semantic scorer
+VECTOR_DIMENSIONS = int(os.getenv("SEMANTIC_VECTOR_DIMENSIONS", "2048"))
+# Number of recordings whose label vectors are kept warm in the container
+LABEL_VECTOR_CACHE_SIZE = int(os.getenv("LABEL_VECTOR_CACHE_SIZE", "5000"))
+
+_label_vector_cache = OrderedDict()
+_label_vector_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase a text and split it into alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """An in-process Okapi BM25 index over short documents such as recording labels."""
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Build the index.
+
+        Args:
+            documents: The documents to index, scored in the same order by score()
+            k1: Term frequency saturation parameter
+            b: Document length normalization parameter
+        """
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(tokenize(document)) for document in documents]
+        self.lengths = [sum(frequencies.values()) for frequencies in self.term_frequencies]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        document_frequencies = Counter()
+        for frequencies in self.term_frequencies:
+            document_frequencies.update(frequencies.keys())
+        count = len(documents)
+        self.idf = {
+            term: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequencies.items()
+        }
+
+    def score(self, query: str) -> List[float]:
+        """Score every indexed document against the query."""
+        query_terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for frequencies, length in zip(self.term_frequencies, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.average_length) if self.average_length else self.k1
+            total = 0.0
+            for term in query_terms:
+                frequency = frequencies.get(term)
+                if frequency:
+                    total += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            scores.append(total)
+        return scores
+
+
+def score_recordings_bm25(ust: str, recordings: List[Dict]) -> Dict[int, float]:
+    """
+    Score each recording by the best BM25 score among its labels.
+
+    Args:
+        ust: The User Search Term
+        recordings: The "Recordings" entries of the request
+
+    Returns:
+        Mapping of serial id (index into recordings) to score
+    """
+    owners = []
+    labels = []
+    for serial_id, recording in enumerate(recordings):
+        for label in recording["Recording_Labels"]:
+            owners.append(serial_id)
+            labels.append(label)
+
+    scores = {serial_id: 0.0 for serial_id in range(len(recordings))}
+    for serial_id, score in zip(owners, BM25Index(labels).score(ust)):
+        scores[serial_id] = max(scores[serial_id], score)
+    return scores
+
+
+def text_features(text: str) -> List[str]:
+    """Character trigrams of every word plus the words themselves."""
+    features = []
+    for token in tokenize(text):
+        padded = f" {token} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        features.append(token)
+    return features
+
+
+def load_numpy() -> bool:
+    """Import NumPy on first use, returns False when it is not installed (semantic scoring is then unavailable, BM25 still works)."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+def hash_vector(text: str) -> "np.ndarray":
+    """Project a text onto a unit-length hashed n-gram vector."""
+    vector = np.zeros(VECTOR_DIMENSIONS, dtype=np.float32)
+    for feature in text_features(text):
+        # crc32 is stable across processes, unlike the salted built-in hash()
+        vector[zlib.crc32(feature.encode()) % VECTOR_DIMENSIONS] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def label_vectors(recording: Dict) -> "np.ndarray":
+    """
+    Return the label vector matrix of a recording, cached by Recording_Id and label hash.
+
+    Args:
+        recording: A "Recordings" entry of the request
+
+    Returns:
+        A (labels x VECTOR_DIMENSIONS) matrix, one row per label
+    """
+    labels = recording["Recording_Labels"]
+    label_hash = hashlib.sha1("\n".join(labels).encode()).hexdigest()
+    key = (recording["Recording_Id"], label_hash)
+    with _label_vector_lock:
+        matrix = _label_vector_cache.get(key)
+        if matrix is not None:
+            _label_vector_cache.move_to_end(key)
+            return matrix
+
+    if labels:
+        matrix = np.vstack([hash_vector(label) for label in labels])
+    else:
+        matrix = np.zeros((0, VECTOR_DIMENSIONS), dtype=np.float32)
+    with _label_vector_lock:
+        _label_vector_cache[key] = matrix
+        while len(_label_vector_cache) > LABEL_VECTOR_CACHE_SIZE:
+            _label_vector_cache.popitem(last=False)
+    return matrix
+
+
+def score_recordings_semantic(ust: str, recordings: List[Dict]) -> Dict[int, float]:
+    """
+    Score each recording by the best cosine similarity between the UST and its labels.
+
+    Args:
+        ust: The User Search Term
+        recordings: The "Recordings" entries of the request
+
+    Returns:
+        Mapping of serial id (index into recordings) to score
+    """
+    matrices = [label_vectors(recording) for recording in recordings]
+    owners = np.repeat(np.arange(len(recordings)), [matrix.shape[0] for matrix in matrices])
+    scores = np.zeros(len(recordings), dtype=np.float32)
+    if len(owners):
+        similarities = np.vstack(matrices) @ hash_vector(ust)
+        np.maximum.at(scores, owners, similarities)
+    return {serial_id: float(score) for serial_id, score in enumerate(scores)}
+
+
+def score_recordings(ust: str, recordings: List[Dict], scorer: str = "bm25") -> Dict[int, float]:
+    """
+    Score recordings with the "bm25", "semantic" or "hybrid" scorer.
+
+    The semantic and hybrid scorers fall back to BM25 when NumPy is not installed.
+    """
+    if scorer in ("semantic", "hybrid") and not load_numpy():
+        print(f"NumPy is not available, using bm25 instead of the {scorer} scorer")
+        scorer = "bm25"
+    if scorer == "semantic":
+        return score_recordings_semantic(ust, recordings)
+    if scorer == "hybrid":
+        lexical = score_recordings_bm25(ust, recordings)
+        semantic = score_recordings_semantic(ust, recordings)
+        lexical_max = max(lexical.values(), default=0.0) or 1.0
+        semantic_max = max(semantic.values(), default=0.0) or 1.0
+        return {serial_id: lexical[serial_id] / lexical_max + semantic[serial_id] / semantic_max
+                for serial_id in lexical}
+    return score_recordings_bm25(ust, recordings)
+
+
+def shortlist_recordings(ust: str, recordings: List[Dict], top_n: int, scorer: str = "bm25") -> Tuple[List[int], Dict[int, float]]:
+    """
+    Pick the top_n recordings most relevant to the UST.
+
+    Args:
+        ust: The User Search Term
+        recordings: The "Recordings" entries of the request
+        top_n: Number of recordings to keep, 0 or less keeps every recording
+        scorer: "bm25", "semantic" or "hybrid"
+
+    Returns:
+        The shortlisted serial ids in catalog order, and the score of every recording
+        (empty when no shortlisting was done)
+    """
+    if top_n <= 0 or top_n >= len(recordings):
+        return list(range(len(recordings))), {}
+
+    scores = score_recordings(ust, recordings, scorer)
+    best = sorted(scores, key=lambda serial_id: (-scores[serial_id], serial_id))[:top_n]
+    return sorted(best), scores
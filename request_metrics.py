@@ -0,0 +1,161 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Emit one structured metrics log line per request
+REQUEST_METRICS = os.getenv("REQUEST_METRICS", "true").lower() == "true"
+# CloudWatch namespace and service dimension of the metrics extracted from that line (Embedded Metric Format)
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "LLM-API")
+METRICS_SERVICE = os.getenv("METRICS_SERVICE", os.getenv("AWS_LAMBDA_FUNCTION_NAME", "LLM-API"))
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+_current_metrics = contextvars.ContextVar("request_metrics", default=None)
+_current_stage = contextvars.ContextVar("request_stage", default=None)
+
+
+class RequestMetrics:
+    """
+    Stage timings and LLM calls of one request.
+
+    Worker threads and tasks started for the request record into the same instance,
+    as long as they run in a copy of its context (see lambda_function.submitInContext).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: List[Dict[str, Any]] = []
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages.append({"stage": name, "ms": round(seconds * 1000, 1)})
+
+    def add_call(self, stage: Optional[str], endpoint: str, model_id: str, seconds: float,
+                 usage: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        call = {"stage": stage, "endpoint": endpoint, "model": model_id, "ms": round(seconds * 1000, 1)}
+        call.update({field: (usage or {}).get(field) or 0 for field in USAGE_FIELDS})
+        if error is not None:
+            call["error"] = error
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Totals of the request so far, followed by every stage timing and LLM call.
+
+        Returns:
+            Dict with total_ms, llm_calls, the summed token usage, per stage count, total_ms and
+            max_ms (stages such as a single extraction call run many times per request), stages and calls
+        """
+        with self._lock:
+            stages, calls = list(self.stages), list(self.calls)
+        per_stage = {}
+        for timing in stages:
+            totals = per_stage.setdefault(timing["stage"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            totals["count"] += 1
+            totals["total_ms"] = round(totals["total_ms"] + timing["ms"], 1)
+            totals["max_ms"] = max(totals["max_ms"], timing["ms"])
+        summary = {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "llm_calls": len(calls),
+            "llm_errors": sum(1 for call in calls if "error" in call)
+        }
+        summary.update({field: sum(call[field] for call in calls) for field in USAGE_FIELDS})
+        summary.update({"per_stage": per_stage, "stages": stages, "calls": calls})
+        return summary
+
+
+def start() -> RequestMetrics:
+    """Begin collecting metrics for the request running in the current context."""
+    metrics = RequestMetrics()
+    _current_metrics.set(metrics)
+    return metrics
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current_metrics.get()
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as a stage of the current request; LLM calls made inside it are attributed to it."""
+    metrics = _current_metrics.get()
+    token = _current_stage.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+        if metrics is not None:
+            metrics.add_stage(name, time.perf_counter() - started)
+
+
+def timed(name: str):
+    """Decorator timing every call of a function or coroutine function as a stage named name."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_coroutine(*args, **kwargs):
+                with stage(name):
+                    return await fn(*args, **kwargs)
+            return timed_coroutine
+
+        @functools.wraps(fn)
+        def timed_function(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return timed_function
+    return decorate
+
+
+def record_call(endpoint: str, model_id: str, seconds: float, usage: Optional[Dict[str, Any]] = None,
+                error: Optional[BaseException] = None, stage_name: Optional[str] = None) -> None:
+    """Record one LLM call attempt for the current request, under stage_name or the enclosing stage."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.add_call(stage_name or _current_stage.get(), endpoint, model_id, seconds, usage,
+                         None if error is None else type(error).__name__)
+
+
+def emf_record(metrics: RequestMetrics, properties: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the request's log record in CloudWatch Embedded Metric Format.
+
+    Totals and the total_ms of every stage become metrics under METRICS_NAMESPACE with a Service
+    dimension, the stage timings, calls and properties are kept as searchable log fields.
+    """
+    summary = metrics.summary()
+    values = {"RequestLatency": summary["total_ms"], "LLMCalls": summary["llm_calls"], "LLMErrors": summary["llm_errors"]}
+    values.update({"".join(part.title() for part in field.split("_")): summary[field] for field in USAGE_FIELDS})
+    values.update({"".join(part.title() for part in name.split("_")) + "Latency": totals["total_ms"]
+                   for name, totals in summary["per_stage"].items()})
+    units = {name: "Milliseconds" if name.endswith("Latency") else "Count" for name in values}
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Service"]],
+                "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()]
+            }]
+        },
+        "Service": METRICS_SERVICE
+    }
+    record.update(values)
+    record.update(properties or {})
+    record.update({"per_stage": summary["per_stage"], "stages": summary["stages"], "calls": summary["calls"]})
+    return record
+
+
+def emit(metrics: RequestMetrics, properties: Optional[Dict[str, Any]] = None) -> None:
+    """Print the request's EMF record as a single log line, when REQUEST_METRICS is on."""
+    if REQUEST_METRICS:
+        print(json.dumps(emf_record(metrics, properties), separators=(",", ":")))
@@ -3,12 +3,6 @@ import boto3
 import sys
 import ast
 
-# Bedrock client used to interact with APIs around models
-bedrock = boto3.client(
-    service_name='bedrock', 
-    region_name='us-west-2'
-)
-
 # Bedrock Runtime client used to invoke and question the models
 bedrock_runtime = boto3.client(
     service_name='bedrock-runtime',
@@ -0,0 +1,183 @@
+import contextvars
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import lambda_function
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+# Requests handled at once
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "32"))
+# Accepted connections that may wait for a free worker, further connections are answered 503 right away
+SERVER_MAX_QUEUED = int(os.getenv("SERVER_MAX_QUEUED", "64"))
+# Seconds a shutdown waits for in-flight requests to finish
+SERVER_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("SERVER_SHUTDOWN_TIMEOUT_SECONDS", "30"))
+SERVER_MAX_BODY_BYTES = int(os.getenv("SERVER_MAX_BODY_BYTES", str(20 * 1024 * 1024)))
+
+OVERLOADED_BODY = json.dumps({"error": "Server overloaded, retry later"}).encode()
+OVERLOADED_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: application/json\r\nRetry-After: 1\r\nConnection: close\r\n"
+    + f"Content-Length: {len(OVERLOADED_BODY)}\r\n\r\n".encode() + OVERLOADED_BODY
+)
+
+
+class PipelineServer(HTTPServer):
+    """
+    Serve lambda_handler over HTTP from a long-running process.
+
+    Connections are handled on a bounded worker pool, with at most max_queued more waiting
+    for a worker; beyond that they are turned away with a 503. The clients, caches and indexes
+    kept in module globals by lambda_function stay warm for the life of the process.
+    """
+
+    def __init__(self, address, workers: int = SERVER_WORKERS, max_queued: int = SERVER_MAX_QUEUED):
+        super().__init__(address, PipelineRequestHandler)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline-worker")
+        self.workers = workers
+        self.max_queued = max_queued
+        self.draining = False
+        self.in_flight = 0
+        self.requests_served = 0
+        self.requests_rejected = 0
+        self.started_at = time.monotonic()
+        self._idle = threading.Condition()
+
+    def process_request(self, request, client_address):
+        # Counted when queued, so a shutdown also waits for connections no worker has picked up yet
+        with self._idle:
+            overloaded = self.in_flight >= self.workers + self.max_queued
+            if overloaded:
+                self.requests_rejected += 1
+            else:
+                self.in_flight += 1
+        if overloaded:
+            self.reject_request(request)
+            return
+        self.executor.submit(self._process_request, request, client_address)
+
+    def reject_request(self, request):
+        # Runs on the accepting thread, so the request is not parsed, only answered and closed
+        try:
+            request.sendall(OVERLOADED_RESPONSE)
+            # Closing with unread data would reset the connection, possibly before the client reads the 503
+            request.setblocking(False)
+            while request.recv(65536):
+                pass
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._idle:
+                self.in_flight -= 1
+                self.requests_served += 1
+                self._idle.notify_all()
+
+    def health(self):
+        with self._idle:
+            return {
+                "status": "draining" if self.draining else "ok",
+                "in_flight": self.in_flight,
+                "workers": self.workers,
+                "requests_served": self.requests_served,
+                "requests_rejected": self.requests_rejected,
+                "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+            }
+
+    def drain(self, timeout: float = SERVER_SHUTDOWN_TIMEOUT_SECONDS):
+        """
+        Stop accepting connections and wait up to timeout seconds for in-flight requests.
+
+        Must not be called from the thread running serve_forever().
+        """
+        self.draining = True
+        self.shutdown()
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self.in_flight and time.monotonic() < deadline:
+                self._idle.wait(deadline - time.monotonic())
+            if self.in_flight:
+                print(f"Shutting down with {self.in_flight} requests still in flight")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.server_close()
+
+
+class PipelineRequestHandler(BaseHTTPRequestHandler):
+    """GET /health reports the server state, a POST to any other path runs lambda_handler on its body."""
+
+    server: PipelineServer
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/health":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        health = self.server.health()
+        self.send_json(503 if self.server.draining else 200, health)
+
+    def do_POST(self):
+        # Connections accepted before a shutdown are still served, only /health turns away new traffic
+        length = int(self.headers.get("content-length") or 0)
+        if length > SERVER_MAX_BODY_BYTES:
+            self.send_json(413, {"error": f"Request body over {SERVER_MAX_BODY_BYTES} bytes"})
+            return
+        # Headers are left out: the pipeline does not read them, and they carry credentials and cookies
+        event = {
+            "body": self.rfile.read(length).decode("utf-8", errors="replace"),
+            "httpMethod": "POST",
+            "path": self.path,
+        }
+        try:
+            # A fresh context per request, so request-scoped context variables never leak between requests on a worker
+            result = contextvars.Context().run(lambda_function.lambda_handler, event, None)
+        except Exception as e:
+            self.send_json(500, {"error": f"Error processing request: {str(e)}"})
+            return
+        body = result.get("body", "")
+        self.send_body(result.get("statusCode", 200), body if isinstance(body, str) else json.dumps(body), result.get("headers"))
+
+    def send_json(self, status, payload):
+        self.send_body(status, json.dumps(payload))
+
+    def send_body(self, status, body, headers=None):
+        encoded = body.encode()
+        self.send_response(status)
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+
+def main():
+    server = PipelineServer((SERVER_HOST, SERVER_PORT))
+    drain_thread = threading.Thread(target=server.drain, name="pipeline-drain")
+
+    def stop(signum, frame):
+        print(f"Received signal {signum}, draining")
+        if drain_thread.ident is None:
+            drain_thread.start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Serving lambda_handler on http://{SERVER_HOST}:{SERVER_PORT} with {SERVER_WORKERS} workers")
+    server.serve_forever()
+    if drain_thread.is_alive():
+        drain_thread.join()
+    print("Server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,137 @@
 import urllib3
+import asyncio
 import json
 import os
-from typing import Optional, Dict, Any, List
+import ssl
+import threading
+from urllib.parse import urlsplit
+from typing import Optional, Dict, Any, Iterator, List, Tuple, Union
+
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com/v1")
+# Connection pool sizing: number of hosts kept and connections kept per host
+POOL_NUM_POOLS = int(os.getenv("ANTHROPIC_POOL_NUM_POOLS", "4"))
+POOL_MAXSIZE = int(os.getenv("ANTHROPIC_POOL_MAXSIZE", "16"))
+CONNECT_TIMEOUT = float(os.getenv("ANTHROPIC_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("ANTHROPIC_READ_TIMEOUT", "60"))
+
+_shared_http = None
+_clients: Dict[Tuple[str, str, str], "SimpleAnthropicClient"] = {}
+_async_clients: Dict[Tuple[str, str, str], "AsyncAnthropicClient"] = {}
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_pool: Optional["AsyncConnectionPool"] = None
+_registry_lock = threading.Lock()
+
+# Message content or system prompt: a plain string, or content blocks which may carry cache_control
+Content = Union[str, List[Dict[str, Any]]]
+
+
+class AnthropicAPIError(Exception):
+    """A non-200 response from the Anthropic API, with the status and retry-after hint needed to retry it."""
+
+    def __init__(self, status: int, body: str, retry_after: Optional[str] = None):
+        super().__init__(f"API request failed with status {status}: {body}")
+        self.status = status
+        self.body = body
+        try:
+            self.retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            # HTTP-date values are rare for this API, fall back to regular backoff
+            self.retry_after = None
+
+
+def cacheable_text(text: str) -> Dict[str, Any]:
+    """
+    Return a text content block marked as a prompt caching breakpoint.
+
+    Everything up to and including this block is cached by the API for a few minutes,
+    so later requests starting with the same blocks only pay for reading the cache.
+    """
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+class TokenUsage:
+    """Running totals of the token usage reported by the API, including prompt cache reads and writes."""
+
+    FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+    def __init__(self):
+        self._totals = dict.fromkeys(self.FIELDS, 0)
+        self._totals["requests"] = 0
+        self._lock = threading.Lock()
+
+    def add(self, usage: Dict[str, Any]) -> None:
+        with self._lock:
+            self._totals["requests"] += 1
+            for field in self.FIELDS:
+                self._totals[field] += usage.get(field) or 0
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._totals)
+
+
+# Usage of every request made through this module, kept across warm invocations
+token_usage = TokenUsage()
+
+
+def normalize_model(model: str) -> str:
+    """Turn a Bedrock model id such as anthropic.claude-3-5-haiku-20241022-v1:0 into an Anthropic API model name."""
+    base = model.split("-v1:")[0]
+    if base.startswith("anthropic."):
+        return base.replace("anthropic.", "")
+    return base
+
+
+def get_pool_manager() -> urllib3.PoolManager:
+    """Return the process-wide keep-alive connection pool, creating it on first use."""
+    global _shared_http
+    with _registry_lock:
+        if _shared_http is None:
+            _shared_http = urllib3.PoolManager(
+                num_pools=POOL_NUM_POOLS,
+                maxsize=POOL_MAXSIZE,
+                timeout=urllib3.Timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT)
+            )
+        return _shared_http
+
+
+def get_client(api_key: str, model: str, base_url: Optional[str] = None) -> "SimpleAnthropicClient":
+    """
+    Return a client for (api_key, model, base_url) from the module-level registry.
+
+    Clients share one connection pool and stay warm across Lambda invocations,
+    so only the first call in a container pays for the TCP and TLS handshake.
+    """
+    key = (api_key, model, base_url or ANTHROPIC_BASE_URL)
+    client = _clients.get(key)
+    if client is None:
+        http = get_pool_manager()
+        with _registry_lock:
+            client = _clients.setdefault(key, SimpleAnthropicClient(api_key, model, http=http, base_url=base_url))
+    return client
+
 
 class SimpleAnthropicClient:
     """A simple client for the Anthropic API using urllib3."""
     
-    def __init__(self, api_key: str, model: str = "claude-3-5-sonnet-20240620"):
+    def __init__(self, api_key: str, model: str = "claude-3-5-sonnet-20240620", http: Optional[urllib3.PoolManager] = None, base_url: Optional[str] = None):
         """
         Initialize the client with API key and model.
         
         Args:
             api_key: Your Anthropic API key
             model: The model to use (defaults to claude-3-opus-20240229)
+            http: Connection pool to send requests through (defaults to a new one)
+            base_url: API root to send requests to (defaults to ANTHROPIC_BASE_URL)
         """
         self.api_key = api_key
-        base = model.split("-v1:")[0]
-        if base.startswith("anthropic."):
-            self.model = base.replace("anthropic.", "")
-        else:
-            self.model = base
-        self.http = urllib3.PoolManager()
-        self.base_url = "https://api.anthropic.com/v1"
+        self.model = normalize_model(model)
+        self.http = http or urllib3.PoolManager(
+            num_pools=POOL_NUM_POOLS,
+            maxsize=POOL_MAXSIZE,
+            timeout=urllib3.Timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT)
+        )
+        self.base_url = base_url or ANTHROPIC_BASE_URL
         
     def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
         """Make a request to the Anthropic API."""
@@ -41,28 +151,89 @@ class SimpleAnthropicClient:
         )
         
         if response.status != 200:
-            raise Exception(f"API request failed with status {response.status}: {response.data.decode()}")
+            raise AnthropicAPIError(response.status, response.data.decode(), response.headers.get("retry-after"))
             
-        return json.loads(response.data.decode())
+        result = json.loads(response.data.decode())
+        token_usage.add(result.get("usage", {}))
+        return result
+
+    def _stream_request(self, method: str, endpoint: str, data: Dict) -> Iterator[Dict[str, Any]]:
+        """
+        Make a streaming request and yield the text deltas and final usage of the server-sent events.
+
+        Yields:
+            {"type": "text", "text": ...} for every text delta, then one
+            {"type": "usage", "usage": {...}} with the input, output and prompt cache token counts
+        """
+        headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+            "accept": "text/event-stream"
+        }
+
+        response = self.http.request(
+            method,
+            f"{self.base_url}/{endpoint}",
+            headers=headers,
+            body=json.dumps(data),
+            preload_content=False
+        )
+        completed = False
+        events = iter_server_sent_events(response.stream(1024))
+        try:
+            if response.status != 200:
+                raise AnthropicAPIError(response.status, response.read().decode(), response.headers.get("retry-after"))
+
+            usage: Dict[str, Any] = {}
+            for event_type, payload in events:
+                if event_type == "message_start":
+                    usage.update(payload["message"].get("usage", {}))
+                elif event_type == "content_block_delta" and payload["delta"].get("type") == "text_delta":
+                    yield {"type": "text", "text": payload["delta"]["text"]}
+                elif event_type == "message_delta":
+                    usage.update(payload.get("usage", {}))
+                elif event_type == "message_stop":
+                    completed = True
+                    break
+                elif event_type == "error":
+                    raise Exception(f"API stream failed: {payload.get('error')}")
+            token_usage.add(usage)
+            yield {"type": "usage", "usage": usage}
+        finally:
+            if completed:
+                # Consume the end of the chunked body so the connection can be reused
+                response.drain_conn()
+            else:
+                # The caller stopped early, unread events would corrupt the next request on this connection
+                response.close()
+            response.release_conn()
+            # Closing urllib3's chunk reader while it still holds the connection closes the connection,
+            # so the event iterator is only closed once the connection is back in the pool
+            events.close()
     
     def create_message(
         self,
-        content: str,
+        content: Content,
         max_tokens: int = 1024,
         temperature: float = 0.7,
-        system: Optional[str] = None
+        system: Optional[Content] = None,
+        stream: bool = False
     ) -> Dict[str, Any]:
         """
         Create a message using the Anthropic API.
         
         Args:
-            content: The message content
+            content: The message content, a string or a list of content blocks
             max_tokens: Maximum number of tokens to generate
             temperature: Sampling temperature (0-1)
-            system: Optional system message
+            system: Optional system message, a string or a list of content blocks
+                (blocks made with cacheable_text() are cached across requests)
+            stream: Stream the response instead of waiting for all of it
         
         Returns:
-            API response as a dictionary
+            API response as a dictionary, or with stream=True an iterator of
+            text deltas followed by the usage block (see _stream_request)
         """
         data = {
             "model": self.model,
@@ -73,10 +244,274 @@ class SimpleAnthropicClient:
         
         if system:
             data["system"] = system
+
+        if stream:
+            data["stream"] = True
+            return self._stream_request("POST", "messages", data=data)
             
         return self._make_request("POST", "messages", data=data)
 
 
+def iter_server_sent_events(chunks: Iterator[bytes]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Parse a server-sent events byte stream into (event type, JSON data) pairs.
+
+    Events are yielded as soon as their terminating blank line arrives, however the
+    stream happens to be chunked. Events without data (such as pings) are skipped.
+    """
+    buffer = b""
+    event_type = "message"
+    data_lines: List[str] = []
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw_line in lines:
+            line = raw_line.rstrip(b"\r").decode()
+            if not line:
+                if data_lines:
+                    yield event_type, json.loads("\n".join(data_lines))
+                event_type = "message"
+                data_lines = []
+            elif line.startswith(":"):
+                continue
+            elif line.startswith("event:"):
+                event_type = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[len("data:"):].strip())
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the long-lived event loop used by the async client.
+
+    The loop runs forever on a daemon thread, so its connection pool stays warm
+    across Lambda invocations. Use run_coroutine() to drive it from sync code.
+    """
+    global _event_loop
+    with _registry_lock:
+        if _event_loop is None:
+            _event_loop = asyncio.new_event_loop()
+            threading.Thread(target=_event_loop.run_forever, name="anthropic-event-loop", daemon=True).start()
+        return _event_loop
+
+
+def run_coroutine(coroutine) -> Any:
+    """Run a coroutine on the shared event loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop()).result()
+
+
+def get_async_client(api_key: str, model: str, base_url: Optional[str] = None) -> "AsyncAnthropicClient":
+    """Return an AsyncAnthropicClient for (api_key, model, base_url), sharing one connection pool on the shared loop."""
+    global _async_pool
+    key = (api_key, model, base_url or ANTHROPIC_BASE_URL)
+    with _registry_lock:
+        if _async_pool is None:
+            _async_pool = AsyncConnectionPool()
+        client = _async_clients.get(key)
+        if client is None:
+            client = _async_clients[key] = AsyncAnthropicClient(api_key, model, pool=_async_pool, base_url=base_url)
+        return client
+
+
+class AsyncConnectionPool:
+    """
+    A minimal HTTP/1.1 keep-alive connection pool on asyncio streams.
+
+    Streams only work on the event loop that opened them, so an idle connection is only reused
+    on its own loop. Callers awaiting from their own loops (asyncio.run) share the pool safely,
+    the idle lists are guarded by a lock since those loops run on different threads.
+    """
+
+    def __init__(self, maxsize: int = POOL_MAXSIZE, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT):
+        """
+        Initialize an empty pool.
+
+        Args:
+            maxsize: Idle connections kept per host
+            connect_timeout: Seconds allowed to open a connection
+            read_timeout: Seconds allowed for the response of a request
+        """
+        self.maxsize = maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[asyncio.AbstractEventLoop, asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+
+    async def request(self, method: str, url: str, headers: Dict[str, str], body: Optional[bytes] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Send a request and read the whole response.
+
+        Returns:
+            The status code, the lowercased response headers and the response body
+        """
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        origin = (parts.scheme, parts.hostname, port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        head = [f"{method} {path} HTTP/1.1", f"host: {parts.netloc}", f"content-length: {len(body or b'')}"]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        payload = ("\r\n".join(head) + "\r\n\r\n").encode() + (body or b"")
+
+        reused, (reader, writer) = await self._acquire(origin)
+        try:
+            writer.write(payload)
+            await writer.drain()
+            status, response_headers, response_body = await asyncio.wait_for(self._read_response(reader), self.read_timeout)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            if not reused:
+                raise
+            # The server dropped an idle keep-alive connection, retry once on a fresh one
+            return await self.request(method, url, headers, body)
+        except BaseException:
+            writer.close()
+            raise
+
+        if response_headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self._release(origin, reader, writer)
+        return status, response_headers, response_body
+
+    async def close(self) -> None:
+        """Close every idle connection opened on the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for connections in self._idle.values():
+                for connection_loop, _, writer in connections:
+                    if connection_loop is loop:
+                        writer.close()
+                connections[:] = [connection for connection in connections if connection[0] is not loop]
+
+    async def _acquire(self, origin: Tuple[str, str, int]):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            connections = self._idle.get(origin, [])
+            # Connections of closed loops are dead and cannot even be closed, they are dropped
+            connections[:] = [connection for connection in connections if not connection[0].is_closed()]
+            for position in range(len(connections) - 1, -1, -1):
+                if connections[position][0] is not loop:
+                    continue
+                _, reader, writer = connections.pop(position)
+                if not reader.at_eof() and not writer.is_closing():
+                    return True, (reader, writer)
+                writer.close()
+        scheme, host, port = origin
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=self._ssl_context if scheme == "https" else None),
+            self.connect_timeout
+        )
+        return False, connection
+
+    def _release(self, origin: Tuple[str, str, int], reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        with self._lock:
+            connections = self._idle.setdefault(origin, [])
+            if len(connections) < self.maxsize:
+                connections.append((asyncio.get_running_loop(), reader, writer))
+                return
+        writer.close()
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bytes]:
+        status_line = await reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    # Skip optional trailers up to the terminating empty line
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            return status, headers, b"".join(chunks)
+        if "content-length" in headers:
+            return status, headers, await reader.readexactly(int(headers["content-length"]))
+        headers["connection"] = "close"
+        return status, headers, await reader.read()
+
+
+class AsyncAnthropicClient:
+    """An asyncio client for the Anthropic API with the same create_message surface as SimpleAnthropicClient."""
+
+    def __init__(self, api_key: str, model: str = "claude-3-5-sonnet-20240620", pool: Optional[AsyncConnectionPool] = None, base_url: Optional[str] = None):
+        """
+        Initialize the client with API key and model.
+
+        Args:
+            api_key: Your Anthropic API key
+            model: The model to use
+            pool: Connection pool to send requests through (defaults to a new one)
+            base_url: API root to send requests to (defaults to ANTHROPIC_BASE_URL)
+        """
+        self.api_key = api_key
+        self.model = normalize_model(model)
+        self.pool = pool or AsyncConnectionPool()
+        self.base_url = base_url or ANTHROPIC_BASE_URL
+
+    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
+        """Make a request to the Anthropic API."""
+        headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json"
+        }
+        status, response_headers, body = await self.pool.request(
+            method,
+            f"{self.base_url}/{endpoint}",
+            headers=headers,
+            body=json.dumps(data).encode() if data else None
+        )
+        if status != 200:
+            raise AnthropicAPIError(status, body.decode(), response_headers.get("retry-after"))
+        result = json.loads(body.decode())
+        token_usage.add(result.get("usage", {}))
+        return result
+
+    async def create_message(
+        self,
+        content: Content,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        system: Optional[Content] = None
+    ) -> Dict[str, Any]:
+        """
+        Create a message using the Anthropic API.
+
+        Args:
+            content: The message content, a string or a list of content blocks
+            max_tokens: Maximum number of tokens to generate
+            temperature: Sampling temperature (0-1)
+            system: Optional system message, a string or a list of content blocks
+                (blocks made with cacheable_text() are cached across requests)
+
+        Returns:
+            API response as a dictionary
+        """
+        data = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": content}],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+
+        if system:
+            data["system"] = system
+
+        return await self._make_request("POST", "messages", data=data)
+
+
 
 def main():
     result = lambda_handler(None, None)
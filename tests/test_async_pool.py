@@ -0,0 +1,121 @@
+import asyncio
+import socketserver
+import threading
+import unittest
+
+import test_anthropic3
+
+BODY = b'{"ok": true}'
+
+
+class HTTPHandler(socketserver.StreamRequestHandler):
+    """
+    Answers keep-alive requests in the server's mode: "length" (content-length bodies),
+    "chunked" (chunked bodies with a trailer), "close" (connection: close) or "stale"
+    (drops a connection without answering when a second request arrives on it).
+    """
+
+    def handle(self):
+        self.server.connections.append(self.client_address)
+        served = 0
+        while True:
+            request_line = self.rfile.readline()
+            if not request_line:
+                return
+            headers = {}
+            for line in iter(self.rfile.readline, b"\r\n"):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            self.rfile.read(int(headers.get("content-length", 0)))
+
+            mode = self.server.mode
+            if mode == "stale" and served:
+                return
+            if mode == "chunked":
+                chunks = b"".join(b"%x\r\n%s\r\n" % (len(BODY[start:start + 5]), BODY[start:start + 5]) for start in range(0, len(BODY), 5))
+                self.wfile.write(b"HTTP/1.1 200 OK\r\ntransfer-encoding: chunked\r\n\r\n" + chunks + b"0\r\nx-trailer: 1\r\n\r\n")
+            else:
+                connection = b"connection: close\r\n" if mode == "close" else b""
+                self.wfile.write(b"HTTP/1.1 200 OK\r\ncontent-length: %d\r\n%s\r\n%s" % (len(BODY), connection, BODY))
+            self.wfile.flush()
+            served += 1
+            if mode == "close":
+                return
+
+
+class AsyncConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), HTTPHandler)
+        self.server.daemon_threads = True
+        self.server.connections = []
+        self.server.mode = "length"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/messages"
+        self.pool = test_anthropic3.AsyncConnectionPool(read_timeout=5)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def send(self, count=2):
+        async def requests():
+            responses = [await self.pool.request("POST", self.url, {"content-type": "application/json"}, b"{}") for _ in range(count)]
+            await self.pool.close()
+            return responses
+        return asyncio.run(requests())
+
+    def test_content_length_body_reuses_connection(self):
+        responses = self.send()
+
+        self.assertEqual([(status, body) for status, _, body in responses], [(200, BODY)] * 2)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_chunked_body_with_trailer(self):
+        self.server.mode = "chunked"
+
+        responses = self.send()
+
+        self.assertEqual([body for _, _, body in responses], [BODY] * 2)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_stale_keep_alive_connection_is_retried(self):
+        self.server.mode = "stale"
+
+        responses = self.send()
+
+        self.assertEqual([(status, body) for status, _, body in responses], [(200, BODY)] * 2)
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_connection_close_is_not_reused(self):
+        self.server.mode = "close"
+
+        responses = self.send()
+
+        self.assertEqual([body for _, _, body in responses], [BODY] * 2)
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_consecutive_event_loops(self):
+        async def request():
+            return await self.pool.request("POST", self.url, {}, b"{}")
+
+        # The first loop's idle connection is left in the pool and must not be used by the second loop
+        first = asyncio.run(request())
+        second = asyncio.run(request())
+
+        self.assertEqual([first[0], second[0]], [200, 200])
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_loops_on_several_threads(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.extend(self.send(count=5))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([status for status, _, _ in results], [200] * 20)
+        self.assertEqual(len(self.server.connections), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
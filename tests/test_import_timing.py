@@ -0,0 +1,20 @@
+import os
+import unittest
+
+import import_timing
+
+# Generous by default since shared CI machines are slow, tighten it locally to catch regressions
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+
+
+class ImportTimingTest(unittest.TestCase):
+    def test_lambda_function_cold_import(self):
+        times = import_timing.import_times("lambda_function")
+
+        for name in ("boto3", "botocore", "numpy"):
+            self.assertNotIn(name, times)
+        self.assertEqual(import_timing.check_budget(times, "lambda_function", IMPORT_TIME_BUDGET_MS), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
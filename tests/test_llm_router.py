@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import lambda_function
+import llm_resilience
+import llm_router
+
+ANSWER = {"content": [{"type": "text", "text": "ok"}], "usage": {"input_tokens": 3, "output_tokens": 1}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers each POST with the next of the server's (status, headers) responses, the last one repeats."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        self.server.requests.append(time.monotonic())
+        status, headers = self.server.responses.pop(0) if len(self.server.responses) > 1 else self.server.responses[0]
+        body = json.dumps(ANSWER if status == 200 else {"type": "error", "error": {"type": str(status)}}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub(*responses):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.responses = list(responses)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"anthropic@http://127.0.0.1:{server.server_port}/v1"
+
+
+class EndpointRouterTest(unittest.TestCase):
+    def setUp(self):
+        self.servers = []
+        patches = [
+            mock.patch.dict(os.environ, {"ANTHROPIC_API_KEY": "key"}),
+            mock.patch.object(llm_router, "FAILURE_THRESHOLD", 2),
+            mock.patch.object(llm_router, "COOLDOWN_SECONDS", 0.2),
+            mock.patch.object(llm_resilience, "RETRY_BASE_SECONDS", 0.001),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def stub(self, *responses):
+        server, endpoint = start_stub(*responses)
+        self.servers.append(server)
+        return server, endpoint
+
+    def use_router(self, *endpoints):
+        router = llm_router.EndpointRouter(list(endpoints))
+        patch = mock.patch.object(lambda_function, "endpoint_router", router)
+        patch.start()
+        self.addCleanup(patch.stop)
+        return router
+
+    def invoke(self, endpoint):
+        return lambda_function.invokeEndpoint(endpoint, "prompt", lambda_function.modelIdTrivial, 0.2)
+
+    def test_breaker_opens_half_opens_and_closes(self):
+        failing_server, failing = self.stub((500, {}))
+        _, healthy = self.stub((200, {}))
+        router = self.use_router(failing, healthy)
+
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                self.invoke(failing)
+        self.assertEqual(router.snapshot()[failing]["state"], llm_router.OPEN)
+        self.assertEqual(router.choose(), healthy)
+
+        # After the cooldown a single trial call is let through, a failing trial opens the breaker again
+        time.sleep(0.25)
+        self.assertEqual(router.choose(exclude=[healthy]), failing)
+        self.assertEqual(router.snapshot()[failing]["state"], llm_router.HALF_OPEN)
+        self.assertEqual(router.choose(), healthy)
+        with self.assertRaises(Exception):
+            self.invoke(failing)
+        self.assertEqual(router.snapshot()[failing]["state"], llm_router.OPEN)
+
+        # A successful trial closes it
+        failing_server.responses = [(200, {})]
+        time.sleep(0.25)
+        self.assertEqual(router.choose(exclude=[healthy]), failing)
+        self.assertEqual(self.invoke(failing), "ok")
+        self.assertEqual(router.snapshot()[failing]["state"], llm_router.CLOSED)
+
+    def test_non_retryable_errors_keep_breaker_closed(self):
+        _, endpoint = self.stub((400, {}))
+        router = self.use_router(endpoint)
+
+        for _ in range(5):
+            with self.assertRaises(Exception):
+                self.invoke(endpoint)
+
+        self.assertEqual(router.snapshot()[endpoint]["state"], llm_router.CLOSED)
+        self.assertEqual(router.snapshot()[endpoint]["failures"], 0)
+
+    def test_retry_honors_retry_after(self):
+        server, endpoint = self.stub((429, {"retry-after": "0.3"}), (200, {}))
+        self.use_router(endpoint)
+
+        answer = lambda_function.invokeRouted(endpoint, "prompt", lambda_function.modelIdTrivial, 0.2)
+
+        self.assertEqual(answer, "ok")
+        self.assertEqual(len(server.requests), 2)
+        self.assertGreaterEqual(server.requests[1] - server.requests[0], 0.3)
+
+    def test_hedged_call_returns_the_faster_answer(self):
+        started = time.monotonic()
+
+        answer = llm_resilience.call_hedged(lambda: time.sleep(1) or "primary", lambda: "hedge", delay=0.05)
+
+        self.assertEqual(answer, "hedge")
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
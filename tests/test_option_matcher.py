@@ -0,0 +1,43 @@
+import unittest
+
+import option_matcher
+
+USERS = [
+    {"possible_value_id": "me", "possible_value_text": "<< me >>"},
+    {"possible_value_id": "9", "possible_value_text": "Dharani Kumar"},
+    {"possible_value_id": "36", "possible_value_text": "Yureshwar Ravuri"},
+    {"possible_value_id": "83", "possible_value_text": "Jitendar Kumar"},
+    {"possible_value_id": "84", "possible_value_text": "Jitendar Sharma"},
+    {"possible_value_id": "99", "possible_value_text": "Abhishek Mathur"},
+]
+LABEL_TOKENS = {"show", "me", "issues", "for", "of", "user"}
+
+
+class ResolveOptionTest(unittest.TestCase):
+    def resolve(self, ust):
+        return option_matcher.resolve_option(ust, USERS, LABEL_TOKENS)
+
+    def test_partial_name_resolves(self):
+        self.assertEqual(self.resolve("show me issues for dharani"), "9")
+        self.assertEqual(self.resolve("issues of abhishek"), "99")
+        self.assertEqual(self.resolve("issues for yureshwar"), "36")
+
+    def test_full_name_breaks_tie(self):
+        self.assertEqual(self.resolve("issues for jitendar kumar"), "83")
+
+    def test_ambiguous_name_is_left_to_llm(self):
+        self.assertIsNone(self.resolve("issues for jitendar"))
+
+    def test_label_words_never_match(self):
+        self.assertIsNone(self.resolve("show me issues"))
+
+    def test_only_name_dropdowns(self):
+        fields = [{"possible_value_id": "closed_on", "possible_value_text": "Closed"},
+                  {"possible_value_id": "status_id", "possible_value_text": "Status"}]
+        self.assertTrue(option_matcher.is_name_dropdown("Users", USERS))
+        self.assertFalse(option_matcher.is_name_dropdown("Users", fields))
+        self.assertFalse(option_matcher.is_name_dropdown("Status", USERS))
+
+
+if __name__ == "__main__":
+    unittest.main()
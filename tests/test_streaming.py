@@ -0,0 +1,116 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import urllib3
+
+import test_anthropic3
+
+
+def sse_event(event_type, payload):
+    return f"event: {event_type}\ndata: {json.dumps(payload)}\n\n"
+
+
+COMPLETE_STREAM = "".join([
+    sse_event("message_start", {"type": "message_start", "message": {"usage": {"input_tokens": 12, "output_tokens": 1, "cache_read_input_tokens": 5}}}),
+    sse_event("ping", {"type": "ping"}),
+    ": keep-alive comment\n\n",
+    sse_event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}),
+    sse_event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "[{\"rank\": 1,"}}),
+    sse_event("ping", {"type": "ping"}),
+    sse_event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": " \"selected_index\": 0}]"}}),
+    sse_event("content_block_stop", {"type": "content_block_stop", "index": 0}),
+    sse_event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 9}}),
+    sse_event("message_stop", {"type": "message_stop"}),
+])
+
+ERROR_STREAM = "".join([
+    sse_event("message_start", {"type": "message_start", "message": {"usage": {"input_tokens": 12, "output_tokens": 1}}}),
+    sse_event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "[{"}}),
+    sse_event("error", {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}),
+])
+
+
+class SSEHandler(BaseHTTPRequestHandler):
+    """Answers every POST with the server's stream, sent as small chunks that split events and lines."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        self.server.connections.append(self.client_address)
+        body = self.server.stream.replace("\n", "\r\n").encode()
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+        for start in range(0, len(body), 7):
+            chunk = body[start:start + 7]
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class StreamingTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), SSEHandler)
+        self.server.daemon_threads = True
+        self.server.connections = []
+        self.server.stream = COMPLETE_STREAM
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        http = urllib3.PoolManager(maxsize=1)
+        self.client = test_anthropic3.SimpleAnthropicClient(
+            "key", "claude-3-5-haiku-20241022", http=http, base_url=f"http://127.0.0.1:{self.server.server_port}/v1"
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_text_deltas_and_usage(self):
+        events = list(self.client.create_message(content="rank", stream=True))
+
+        self.assertEqual([event["text"] for event in events if event["type"] == "text"],
+                         ["[{\"rank\": 1,", " \"selected_index\": 0}]"])
+        self.assertEqual(events[-1], {"type": "usage", "usage": {"input_tokens": 12, "output_tokens": 9, "cache_read_input_tokens": 5}})
+
+    def test_connection_returns_to_pool(self):
+        for _ in range(3):
+            list(self.client.create_message(content="rank", stream=True))
+
+        self.assertEqual(len(self.server.connections), 3)
+        self.assertEqual(len(set(self.server.connections)), 1)
+
+    def test_error_event_raises_and_discards_connection(self):
+        self.server.stream = ERROR_STREAM
+        events = []
+        with self.assertRaisesRegex(Exception, "overloaded_error"):
+            for event in self.client.create_message(content="rank", stream=True):
+                events.append(event)
+        self.assertEqual(events, [{"type": "text", "text": "[{"}])
+
+        # The failed stream's connection is closed, the next stream opens a fresh one
+        self.server.stream = COMPLETE_STREAM
+        list(self.client.create_message(content="rank", stream=True))
+        self.assertEqual(len(set(self.server.connections)), 2)
+
+
+class ServerSentEventsTest(unittest.TestCase):
+    def test_events_split_across_chunks(self):
+        stream = COMPLETE_STREAM.replace("\n", "\r\n").encode()
+        chunks = [stream[start:start + 3] for start in range(0, len(stream), 3)]
+
+        events = list(test_anthropic3.iter_server_sent_events(iter(chunks)))
+
+        self.assertEqual([event_type for event_type, _ in events], [
+            "message_start", "ping", "content_block_start", "content_block_delta", "ping",
+            "content_block_delta", "content_block_stop", "message_delta", "message_stop",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()